@@ -2,7 +2,10 @@
 NBCM V2.5 - Modèle CMDB
 Référentiel des serveurs
 """
-from datetime import datetime
+from datetime import datetime, timedelta
+
+import orjson
+from sqlalchemy.ext.hybrid import hybrid_property
 
 from app import db
 
@@ -10,6 +13,10 @@ from app import db
 class ReferentielCMDB(db.Model):
     """Référentiel des serveurs CMDB"""
     __tablename__ = 'referentiel_cmdb'
+    __table_args__ = (
+        # Calcul de conformité : serveurs backup_enabled hors période de désactivation
+        db.Index('ix_cmdb_enabled_fin', 'backup_enabled', 'date_fin_desactivation'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     hostname = db.Column(db.String(255), unique=True, nullable=False, index=True)
@@ -33,21 +40,36 @@ class ReferentielCMDB(db.Model):
     responsable = db.Column(db.String(100))
     tags = db.Column(db.Text)  # JSON array
     
-    def est_desactive_temporairement(self):
-        """Vérifie si le serveur est temporairement désactivé"""
+    @hybrid_property
+    def desactive_temporairement(self):
+        """Serveur dans sa période de désactivation temporaire (utilisable aussi en filtre SQL)"""
         if not self.date_debut_desactivation or not self.date_fin_desactivation:
             return False
         now = datetime.now()
         return self.date_debut_desactivation <= now <= self.date_fin_desactivation
     
+    @desactive_temporairement.expression
+    def desactive_temporairement(cls):
+        now = datetime.now()
+        return db.and_(
+            cls.date_debut_desactivation.isnot(None),
+            cls.date_fin_desactivation.isnot(None),
+            cls.date_debut_desactivation <= now,
+            cls.date_fin_desactivation >= now
+        )
+    
+    def est_desactive_temporairement(self):
+        """Vérifie si le serveur est temporairement désactivé"""
+        return self.desactive_temporairement
+    
     def desactiver_temporairement(self, duree_jours, raison, utilisateur='admin'):
         """Désactive temporairement le serveur"""
-        from datetime import timedelta
-        self.date_debut_desactivation = datetime.now()
-        self.date_fin_desactivation = datetime.now() + timedelta(days=duree_jours)
+        now = datetime.now()
+        self.date_debut_desactivation = now
+        self.date_fin_desactivation = now + timedelta(days=duree_jours)
         self.raison_desactivation = raison
         self.modifie_par = utilisateur
-        self.date_modification = datetime.now()
+        self.date_modification = now
     
     def reactiver(self, utilisateur='admin'):
         """Réactive le serveur (FIX BUG V2.2)"""
@@ -57,18 +79,24 @@ class ReferentielCMDB(db.Model):
         self.modifie_par = utilisateur
         self.date_modification = datetime.now()
     
+    # Dernière analyse de tags : (texte JSON, liste), valable tant que self.tags n'a pas changé
+    _tags_cache = None
+    
     def get_tags_list(self):
         """Retourne les tags sous forme de liste"""
-        import json
-        try:
-            return json.loads(self.tags) if self.tags else []
-        except:
-            return []
+        cached = self._tags_cache
+        if cached is None or cached[0] != self.tags:
+            try:
+                tags_list = orjson.loads(self.tags) if self.tags else []
+            except orjson.JSONDecodeError:
+                tags_list = []
+            cached = self._tags_cache = (self.tags, tags_list)
+        return list(cached[1])
     
     def set_tags_list(self, tags_list):
         """Définit les tags depuis une liste"""
-        import json
-        self.tags = json.dumps(tags_list)
+        self.tags = orjson.dumps(tags_list).decode()
+        self._tags_cache = (self.tags, list(tags_list))
     
     def to_dict(self):
         """Sérialisation pour l'API"""
@@ -123,3 +151,26 @@ class CMDBHistory(db.Model):
         )
         db.session.add(entry)
         return entry
+    
+    @classmethod
+    def log_changes_bulk(cls, entries):
+        """
+        Enregistre plusieurs changements en un seul INSERT groupé.
+        entries : dicts avec les mêmes clés que log_change (cmdb_id, action, field_name,
+        old_value, new_value, modified_by).
+        """
+        if not entries:
+            return
+        now = datetime.now()
+        db.session.bulk_insert_mappings(cls, [
+            {
+                'cmdb_id': e['cmdb_id'],
+                'action': e['action'],
+                'field_name': e.get('field_name'),
+                'old_value': str(e['old_value']) if e.get('old_value') is not None else None,
+                'new_value': str(e['new_value']) if e.get('new_value') is not None else None,
+                'modified_by': e.get('modified_by', 'system'),
+                'modified_at': now
+            }
+            for e in entries
+        ])
@@ -2,11 +2,27 @@
 NBCM V2.5 - Modèles Conformité et Archives
 """
 from datetime import datetime
-import json
+from operator import attrgetter
+import orjson
+from sqlalchemy import text
+from sqlalchemy.orm import deferred
 
 from app import db
 
 
+def _iso(d):
+    """Date au format ISO ou None"""
+    return d.isoformat() if d else None
+
+
+# Statistiques communes à l'historique et aux archives (ordre de sérialisation)
+_STATS_FIELDS = (
+    'total_cmdb', 'total_backup_enabled', 'total_jobs',
+    'nb_conformes', 'nb_non_conformes', 'nb_non_references', 'taux_conformite'
+)
+_get_stats = attrgetter(*_STATS_FIELDS)
+
+
 class HistoriqueConformite(db.Model):
     """Historique des calculs de conformité"""
     __tablename__ = 'historique_conformite'
@@ -25,28 +41,24 @@ class HistoriqueConformite(db.Model):
     def get_details(self):
         """Retourne les détails en dict"""
         try:
-            return json.loads(self.details_json) if self.details_json else {}
+            return orjson.loads(self.details_json) if self.details_json else {}
         except:
             return {}
     
     def to_dict(self):
         """Sérialisation pour l'API"""
-        return {
-            'id': self.id,
-            'date_calcul': self.date_calcul.isoformat() if self.date_calcul else None,
-            'total_cmdb': self.total_cmdb,
-            'total_backup_enabled': self.total_backup_enabled,
-            'total_jobs': self.total_jobs,
-            'nb_conformes': self.nb_conformes,
-            'nb_non_conformes': self.nb_non_conformes,
-            'nb_non_references': self.nb_non_references,
-            'taux_conformite': self.taux_conformite
-        }
+        data = {'id': self.id, 'date_calcul': _iso(self.date_calcul)}
+        data.update(zip(_STATS_FIELDS, _get_stats(self)))
+        return data
 
 
 class ArchiveConformite(db.Model):
     """Archives quotidiennes de conformité"""
     __tablename__ = 'archive_conformite'
+    __table_args__ = (
+        # Recherche d'une archive par période (anti-doublon de l'archivage)
+        db.Index('ix_archive_periode', 'date_debut_periode', 'date_fin_periode'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     date_archivage = db.Column(db.DateTime, default=datetime.now, nullable=False, index=True)
@@ -62,53 +74,86 @@ class ArchiveConformite(db.Model):
     nb_non_references = db.Column(db.Integer)
     taux_conformite = db.Column(db.Float)
     
-    # Listes (JSON)
-    liste_conformes = db.Column(db.Text)
-    liste_non_conformes = db.Column(db.Text)
-    liste_non_references = db.Column(db.Text)
-    donnees_json = db.Column(db.Text)
+    # Listes (JSON) - chargées à la demande, en un seul SELECT pour le groupe
+    # (utiliser undefer_group('listes') quand elles sont affichées en liste)
+    liste_conformes = deferred(db.Column(db.Text), group='listes')
+    liste_non_conformes = deferred(db.Column(db.Text), group='listes')
+    liste_non_references = deferred(db.Column(db.Text), group='listes')
+    donnees_json = deferred(db.Column(db.Text))
     
     def get_liste_conformes(self):
         try:
-            return json.loads(self.liste_conformes) if self.liste_conformes else []
+            return orjson.loads(self.liste_conformes) if self.liste_conformes else []
         except:
             return []
     
     def get_liste_non_conformes(self):
         try:
-            return json.loads(self.liste_non_conformes) if self.liste_non_conformes else []
+            return orjson.loads(self.liste_non_conformes) if self.liste_non_conformes else []
         except:
             return []
     
     def get_liste_non_references(self):
         try:
-            return json.loads(self.liste_non_references) if self.liste_non_references else []
+            return orjson.loads(self.liste_non_references) if self.liste_non_references else []
         except:
             return []
     
-    def to_dict(self):
-        """Sérialisation pour l'API"""
-        return {
+    # Listes paginables via get_liste_page
+    LISTES = ('conformes', 'non_conformes', 'non_references')
+    
+    def get_liste_page(self, liste, offset, limit):
+        """
+        Tranche [offset:offset+limit] d'une liste et sa taille totale.
+        Sous PostgreSQL la liste est découpée par la base (json_array_elements)
+        sans être chargée ni décodée entièrement.
+        
+        Returns:
+            (total, elements)
+        """
+        if liste not in self.LISTES:
+            raise ValueError(f"Liste inconnue: {liste}")
+        colonne = f'liste_{liste}'
+        
+        if colonne in self.__dict__ or db.engine.dialect.name != 'postgresql':
+            elements = getattr(self, f'get_{colonne}')()
+            return len(elements), elements[offset:offset + limit]
+        
+        params = {'id': self.id, 'offset': offset, 'limit': limit}
+        total = db.session.execute(text(
+            f"SELECT json_array_length({colonne}::json) FROM archive_conformite WHERE id = :id"
+        ), params).scalar() or 0
+        elements = db.session.execute(text(
+            f"SELECT t.element FROM archive_conformite, "
+            f"json_array_elements({colonne}::json) WITH ORDINALITY AS t(element, rang) "
+            f"WHERE id = :id ORDER BY t.rang OFFSET :offset LIMIT :limit"
+        ), params).scalars().all()
+        return total, elements
+    
+    def to_dict(self, include_lists=True):
+        """Sérialisation pour l'API (include_lists=False : sans les listes)"""
+        data = {
             'id': self.id,
-            'date_archivage': self.date_archivage.isoformat() if self.date_archivage else None,
-            'date_debut_periode': self.date_debut_periode.isoformat() if self.date_debut_periode else None,
-            'date_fin_periode': self.date_fin_periode.isoformat() if self.date_fin_periode else None,
-            'total_cmdb': self.total_cmdb,
-            'total_backup_enabled': self.total_backup_enabled,
-            'total_jobs': self.total_jobs,
-            'nb_conformes': self.nb_conformes,
-            'nb_non_conformes': self.nb_non_conformes,
-            'nb_non_references': self.nb_non_references,
-            'taux_conformite': self.taux_conformite,
-            'liste_conformes': self.get_liste_conformes(),
-            'liste_non_conformes': self.get_liste_non_conformes(),
-            'liste_non_references': self.get_liste_non_references()
+            'date_archivage': _iso(self.date_archivage),
+            'date_debut_periode': _iso(self.date_debut_periode),
+            'date_fin_periode': _iso(self.date_fin_periode),
         }
+        data.update(zip(_STATS_FIELDS, _get_stats(self)))
+        if not include_lists:
+            return data
+        data['liste_conformes'] = self.get_liste_conformes()
+        data['liste_non_conformes'] = self.get_liste_non_conformes()
+        data['liste_non_references'] = self.get_liste_non_references()
+        return data
 
 
 class Recipient(db.Model):
     """Destinataires des rapports"""
     __tablename__ = 'recipients'
+    __table_args__ = (
+        # Emails programmés : destinataires actifs à une heure donnée
+        db.Index('ix_recipients_active_time', 'schedule_time', postgresql_where=db.text('active')),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -135,8 +180,8 @@ class Recipient(db.Model):
             'report_format': self.report_format,
             'include_details': self.include_details,
             'language': self.language,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'last_sent': self.last_sent.isoformat() if self.last_sent else None
+            'created_at': _iso(self.created_at),
+            'last_sent': _iso(self.last_sent)
         }
 
 
@@ -154,13 +199,15 @@ class Configuration(db.Model):
     def get_value(self):
         """Retourne la valeur désérialisée"""
         try:
-            return json.loads(self.valeur)
+            return orjson.loads(self.valeur)
         except:
             return self.valeur
     
     def set_value(self, value):
-        """Sérialise et stocke la valeur"""
+        """Sérialise et stocke la valeur (bytes : JSON déjà encodé par l'appelant)"""
         if isinstance(value, (dict, list)):
-            self.valeur = json.dumps(value)
+            self.valeur = orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+        elif isinstance(value, (bytes, bytearray)):
+            self.valeur = value.decode()
         else:
             self.valeur = str(value)
@@ -3,15 +3,17 @@ NBCM V3.0 - Routes Administration
 Configuration système et maintenance - Architecture multi-pages
 """
 from datetime import datetime, timedelta
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+import orjson
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
 from flask_login import current_user
-from sqlalchemy import text
+from sqlalchemy import text, select, func
+from sqlalchemy.orm import load_only
 
-from app import db
+from app import db, cache
 from app.models.cmdb import ReferentielCMDB, CMDBHistory
 from app.models.jobs import JobAltaview, ImportHistory
 from app.services.config_service import get_config, set_config
-from app.services.scheduler_service import get_scheduler_status, reschedule_archive
+from app.services.scheduler_service import get_scheduler_status, reschedule_archive, reschedule_imap, get_imap_interval
 from app.services.compliance_service import archiver_conformite_quotidienne
 from app.services.import_service import supprimer_doublons_altaview
 from app.services.external_import_service import fetch_imap_attachments, fetch_altaview_api
@@ -23,6 +25,52 @@ admin_bp = Blueprint('admin', __name__)
 # Variable pour suivre le temps de démarrage
 start_time = None
 
+# Champs des formulaires de configuration : nom -> valeur par défaut
+EMAIL_CONFIG_FIELDS = {
+    'smtp_server': None,
+    'smtp_port': '587',
+    'smtp_user': None,
+    'smtp_password': None,
+    'email_from': None,
+    'email_to': None,
+}
+IMAP_CONFIG_FIELDS = {
+    'server': None,
+    'user': None,
+    'password': None,
+    'subject_filter': 'NetBackup',
+    'archive_folder': 'Archives_Altaview',
+    'check_interval': '15',
+}
+API_CONFIG_FIELDS = {
+    'url': None,
+    'token': None,
+}
+
+
+# Historique des imports externes : types concernés et colonnes affichées
+EXTERNAL_IMPORT_TYPES = ('altaview', 'altaview_api', 'imap')
+IMPORT_HISTORY_LIST_COLUMNS = (
+    ImportHistory.type_import,
+    ImportHistory.filename,
+    ImportHistory.nb_lignes,
+    ImportHistory.statut,
+    ImportHistory.message,
+    ImportHistory.utilisateur,
+    ImportHistory.date_import,
+)
+
+
+def _form_config(fields):
+    """
+    Construit un dict de configuration depuis le formulaire en une passe
+    (champ -> valeur par défaut ; la case à cocher 'actif' devient un booléen).
+    """
+    form = request.form
+    config = {name: form.get(name, default) for name, default in fields.items()}
+    config['actif'] = form.get('actif') == 'on'
+    return config
+
 
 # ============================================================================
 # DIAGNOSTIC & MONITORING
@@ -76,15 +124,7 @@ def smtp_schedule():
 @admin_required
 def config_email():
     """Configurer l'envoi email"""
-    config = {
-        'smtp_server': request.form.get('smtp_server'),
-        'smtp_port': request.form.get('smtp_port', '587'),
-        'smtp_user': request.form.get('smtp_user'),
-        'smtp_password': request.form.get('smtp_password'),
-        'email_from': request.form.get('email_from'),
-        'email_to': request.form.get('email_to'),
-        'actif': request.form.get('actif') == 'on'
-    }
+    config = _form_config(EMAIL_CONFIG_FIELDS)
     set_config('email_rapport', config, 'Configuration Email', current_user.username)
     flash('Configuration email enregistrée.', 'success')
     return redirect(url_for('admin.smtp'))
@@ -119,10 +159,14 @@ def imap():
 @admin_required
 def imap_history():
     """Historique des imports IMAP"""
-    # Récupérer les imports IMAP/Altaview
-    imports = ImportHistory.query.filter(
-        ImportHistory.type_import.in_(['altaview', 'altaview_api', 'imap'])
-    ).order_by(ImportHistory.date_import.desc()).limit(100).all()
+    # Récupérer les imports IMAP/Altaview (uniquement les colonnes affichées)
+    imports = db.session.execute(
+        select(ImportHistory)
+        .where(ImportHistory.type_import.in_(EXTERNAL_IMPORT_TYPES))
+        .order_by(ImportHistory.date_import.desc())
+        .limit(100)
+        .options(load_only(*IMPORT_HISTORY_LIST_COLUMNS))
+    ).scalars().all()
     
     return render_template('admin/imap_history.html', imports=imports)
 
@@ -131,16 +175,18 @@ def imap_history():
 @admin_required
 def config_imap():
     """Configurer l'import IMAP"""
-    config = {
-        'server': request.form.get('server'),
-        'user': request.form.get('user'),
-        'password': request.form.get('password'),
-        'subject_filter': request.form.get('subject_filter', 'NetBackup'),
-        'archive_folder': request.form.get('archive_folder', 'Archives_Altaview'),
-        'check_interval': request.form.get('check_interval', '15'),
-        'actif': request.form.get('actif') == 'on'
-    }
+    config = _form_config(IMAP_CONFIG_FIELDS)
     set_config('email_import', config, 'Configuration IMAP', current_user.username)
+    
+    # Appliquer l'intervalle : directement si le scheduler tourne dans ce
+    # processus, sinon via le signal Redis
+    if not reschedule_imap(get_imap_interval(config)):
+        try:
+            from app.services.scheduler_reload_service import get_reload_service
+            get_reload_service().signal_reload_imap()
+        except Exception as e:
+            current_app.logger.warning(f"Signal reload IMAP impossible: {e}")
+    
     flash('Configuration IMAP enregistrée.', 'success')
     return redirect(url_for('admin.imap'))
 
@@ -170,11 +216,7 @@ def api():
 @admin_required
 def config_api():
     """Configurer l'API Altaview"""
-    config = {
-        'url': request.form.get('url'),
-        'token': request.form.get('token'),
-        'actif': request.form.get('actif') == 'on'
-    }
+    config = _form_config(API_CONFIG_FIELDS)
     set_config('altaview_api', config, 'Configuration API', current_user.username)
     flash('Configuration API enregistrée.', 'success')
     return redirect(url_for('admin.api'))
@@ -214,8 +256,9 @@ def api_schedule():
 @admin_required
 def config_api_schedule():
     """Configurer la planification API"""
-    interval_minutes = int(request.form.get('interval_minutes', 60))
-    actif = request.form.get('actif') == 'on'
+    form = request.form
+    interval_minutes = int(form.get('interval_minutes', 60))
+    actif = form.get('actif') == 'on'
     
     # Validation de l'intervalle
     if interval_minutes < 5:
@@ -245,14 +288,30 @@ def config_api_schedule():
 # MAINTENANCE DB - Purges et nettoyage base de données
 # ============================================================================
 
+# Statistiques DB mises en cache quelques secondes (navigation entre les onglets maintenance)
+DB_STATS_CACHE_KEY = 'admin_db_stats'
+DB_STATS_CACHE_TIMEOUT = 10
+
+
+def _invalidate_db_stats():
+    """Invalide le cache des statistiques DB après une purge / un nettoyage"""
+    cache.delete(DB_STATS_CACHE_KEY)
+
+
+@cache.cached(timeout=DB_STATS_CACHE_TIMEOUT, key_prefix=DB_STATS_CACHE_KEY)
 def _get_db_stats():
-    """Helper pour récupérer les statistiques DB"""
+    """Helper pour récupérer les statistiques DB (les trois comptages en une requête)"""
+    date_limite = datetime.now() - timedelta(days=180)
+    cmdb_count, jobs_count, jobs_old_count = db.session.execute(select(
+        select(func.count()).select_from(ReferentielCMDB).scalar_subquery(),
+        select(func.count()).select_from(JobAltaview).scalar_subquery(),
+        select(func.count()).select_from(JobAltaview)
+        .where(JobAltaview.backup_time < date_limite).scalar_subquery()
+    )).one()
     return {
-        'cmdb_count': ReferentielCMDB.query.count(),
-        'jobs_count': JobAltaview.query.count(),
-        'jobs_old_count': JobAltaview.query.filter(
-            JobAltaview.backup_time < datetime.now() - timedelta(days=180)
-        ).count(),
+        'cmdb_count': cmdb_count,
+        'jobs_count': jobs_count,
+        'jobs_old_count': jobs_old_count,
         'dedup_active': get_config('dedup_auto', {}).get('actif', False)
     }
 
@@ -293,18 +352,16 @@ def purge_cmdb():
     """Purger complètement la CMDB"""
     if request.form.get('confirmation', '').strip().upper() == 'DELETE':
         try:
-            # Compter avant de supprimer
-            cmdb_count = ReferentielCMDB.query.count()
-            history_count = CMDBHistory.query.count()
-            
-            # Supprimer d'abord l'historique (clé étrangère)
-            CMDBHistory.query.delete()
+            # Supprimer d'abord l'historique (clé étrangère) ;
+            # delete() renvoie le nombre de lignes supprimées, pas besoin de COUNT préalable
+            history_count = CMDBHistory.query.delete(synchronize_session=False)
             
             # Puis supprimer la CMDB
-            ReferentielCMDB.query.delete()
+            cmdb_count = ReferentielCMDB.query.delete(synchronize_session=False)
             
             # Commit
             db.session.commit()
+            _invalidate_db_stats()
             
             # Log
             ImportHistory(
@@ -331,9 +388,9 @@ def purge_cmdb():
 def purge_altaview():
     """Purger complètement les jobs Altaview"""
     if request.form.get('confirmation', '').strip().upper() == 'DELETE':
-        count = JobAltaview.query.count()
-        JobAltaview.query.delete()
+        count = JobAltaview.query.delete(synchronize_session=False)
         db.session.commit()
+        _invalidate_db_stats()
         
         ImportHistory(
             type_import='altaview',
@@ -355,10 +412,13 @@ def purge_altaview():
 @admin_required
 def cleanup_old_jobs():
     """Nettoyer les anciens jobs"""
+    date_limite = datetime.now() - timedelta(days=180)
+    # DELETE ... WHERE direct, sans charger les lignes dans la session
     count = JobAltaview.query.filter(
-        JobAltaview.backup_time < datetime.now() - timedelta(days=180)
-    ).delete()
+        JobAltaview.backup_time < date_limite
+    ).delete(synchronize_session=False)
     db.session.commit()
+    _invalidate_db_stats()
     flash(f'{count} anciens jobs supprimés.', 'success')
     return redirect(url_for('admin.maintenance_db_cleanup_old'))
 
@@ -369,6 +429,7 @@ def config_dedup():
     """Configurer l'auto-déduplication"""
     config = {'actif': request.form.get('actif') == 'on'}
     set_config('dedup_auto', config, 'Auto-nettoyage doublons', current_user.username)
+    _invalidate_db_stats()
     flash('Configuration auto-déduplication mise à jour.', 'success')
     return redirect(url_for('admin.maintenance_db'))
 
@@ -378,6 +439,7 @@ def config_dedup():
 def supprimer_doublons():
     """Supprimer les doublons manuellement"""
     result = supprimer_doublons_altaview(force=True)
+    _invalidate_db_stats()
     
     if 'error' in result:
         flash(f"Erreur: {result['error']}", 'danger')
@@ -430,7 +492,7 @@ def cleanup_stats():
     """Statistiques du répertoire processed/ (API JSON)"""
     from app.services.cleanup_service import cleanup_service
     stats = cleanup_service.get_directory_stats()
-    return jsonify(stats)
+    return current_app.response_class(orjson.dumps(stats), mimetype='application/json')
 
 
 # ============================================================================
@@ -455,9 +517,10 @@ def archive_schedule():
 @admin_required
 def config_archive():
     """Configurer l'archivage"""
-    heure = int(request.form.get('heure', 18))
-    minute = int(request.form.get('minute', 0))
-    actif = request.form.get('actif') == 'on'
+    form = request.form
+    heure = int(form.get('heure', 18))
+    minute = int(form.get('minute', 0))
+    actif = form.get('actif') == 'on'
     
     config = {'heure': heure, 'minute': minute, 'actif': actif}
     set_config('archive_config', config, 'Configuration Archivage', current_user.username)
@@ -183,7 +183,7 @@ def import_page():
             # Mode remplacement : supprimer les jobs des dernières 24h avant import
             if mode == 'replace':
                 date_limite = datetime.now() - timedelta(hours=24)
-                deleted = JobAltaview.query.filter(JobAltaview.backup_time >= date_limite).delete()
+                deleted = JobAltaview.query.filter(JobAltaview.backup_time >= date_limite).delete(synchronize_session=False)
                 db.session.commit()
                 current_app.logger.info(f"Mode remplacement: {deleted} jobs supprimés")
             
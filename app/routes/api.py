@@ -4,6 +4,7 @@ Endpoints pour intégrations externes
 """
 from functools import wraps
 from flask import Blueprint, jsonify, request, current_app
+from sqlalchemy.orm import undefer_group
 
 from app import db
 from app.models.user import User
@@ -225,14 +226,19 @@ def archives():
     """Liste des archives"""
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
+    include_lists = request.args.get('include_lists', 'true').lower() == 'true'
     
-    pagination = ArchiveConformite.query.order_by(
+    query = ArchiveConformite.query
+    if include_lists:
+        query = query.options(undefer_group('listes'))
+    
+    pagination = query.order_by(
         ArchiveConformite.date_archivage.desc()
     ).paginate(page=page, per_page=per_page, error_out=False)
     
     return jsonify({
         'status': 'success',
-        'data': [a.to_dict() for a in pagination.items],
+        'data': [a.to_dict(include_lists=include_lists) for a in pagination.items],
         'meta': {
             'page': page,
             'per_page': per_page,
@@ -242,6 +248,31 @@ def archives():
     })
 
 
+@api_bp.route('/archives/<int:id>/<liste>')
+@require_api_key
+def archive_liste(id, liste):
+    """Liste paginée d'une archive (conformes, non_conformes, non_references)"""
+    if liste not in ArchiveConformite.LISTES:
+        return jsonify({'error': 'Unknown list'}), 404
+    
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 100, type=int), 1), 1000)
+    
+    archive = ArchiveConformite.query.get_or_404(id)
+    total, items = archive.get_liste_page(liste, (page - 1) * per_page, per_page)
+    
+    return jsonify({
+        'status': 'success',
+        'data': items,
+        'meta': {
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'pages': (total + per_page - 1) // per_page
+        }
+    })
+
+
 @api_bp.route('/imports')
 @require_api_key
 def imports():
@@ -2,9 +2,13 @@
 NBCM V2.5 - Routes Archives
 Gestion des archives quotidiennes et manuelles
 """
+import os
+import glob
 import json
-from flask import Blueprint, render_template, redirect, url_for, flash, make_response, request
+import shutil
+from flask import Blueprint, render_template, redirect, url_for, flash, request, send_file, current_app
 from flask_login import login_required
+from sqlalchemy.orm import undefer_group
 
 from app import db
 from app.models.compliance import ArchiveConformite
@@ -26,7 +30,9 @@ def quotidiennes():
     Affiche l'historique des archives quotidiennes automatiques
     (Menu jaune dans la sidebar)
     """
-    archives_list = ArchiveConformite.query.order_by(
+    archives_list = ArchiveConformite.query.options(
+        undefer_group('listes')
+    ).order_by(
         ArchiveConformite.date_archivage.desc()
     ).all()
     
@@ -86,36 +92,82 @@ def index():
 # ACTIONS COMMUNES - PDF, Excel, Suppression
 # ============================================================================
 
+def _archive_export_path(archive, extension):
+    """Chemin du fichier exporté d'une archive (horodaté par la date d'archivage)"""
+    return os.path.join(
+        current_app.config['ARCHIVE_EXPORT_DIR'],
+        f"archive_{archive.id}_{archive.date_archivage.strftime('%Y%m%d%H%M%S')}.{extension}"
+    )
+
+
+def _cached_archive_export(archive, extension, build):
+    """
+    Une archive est figée : son PDF/Excel est généré une fois, conservé sur disque
+    et resservi tel quel aux téléchargements suivants (le worker n'est plus bloqué).
+    Retourne un chemin, le buffer généré si l'écriture disque échoue, ou None.
+    """
+    path = _archive_export_path(archive, extension)
+    if os.path.exists(path):
+        return path
+    
+    buffer = build()
+    if buffer is None:
+        return None
+    
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            shutil.copyfileobj(buffer, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        current_app.logger.warning(f"⚠️ Export archive non mis en cache ({path}): {e}")
+        buffer.seek(0)
+        return buffer
+    
+    buffer.close()
+    return path
+
+
+def _delete_archive_exports(archive_id):
+    """Supprime les exports mis en cache d'une archive"""
+    pattern = os.path.join(current_app.config['ARCHIVE_EXPORT_DIR'], f'archive_{archive_id}_*')
+    for path in glob.glob(pattern):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
 @archives_bp.route('/<int:id>/pdf')
 @login_required
 def pdf(id):
     """Télécharger le PDF d'une archive"""
     archive = ArchiveConformite.query.get_or_404(id)
     
-    conformite = {
-        'total_cmdb': archive.total_cmdb,
-        'total_backup_enabled': archive.total_backup_enabled,
-        'total_attendus': archive.total_backup_enabled,
-        'total_jobs': archive.total_jobs,
-        'conformes': archive.nb_conformes,
-        'non_conformes': archive.nb_non_conformes,
-        'non_references': archive.nb_non_references,
-        'taux_conformite': archive.taux_conformite,
-        'liste_conformes': archive.get_liste_conformes(),
-        'liste_non_conformes': archive.get_liste_non_conformes(),
-        'liste_non_references': archive.get_liste_non_references(),
-        'date_debut_periode': archive.date_debut_periode,
-        'date_fin_periode': archive.date_fin_periode
-    }
+    def build():
+        conformite = {
+            'total_cmdb': archive.total_cmdb,
+            'total_backup_enabled': archive.total_backup_enabled,
+            'total_attendus': archive.total_backup_enabled,
+            'total_jobs': archive.total_jobs,
+            'conformes': archive.nb_conformes,
+            'non_conformes': archive.nb_non_conformes,
+            'non_references': archive.nb_non_references,
+            'taux_conformite': archive.taux_conformite,
+            'liste_conformes': archive.get_liste_conformes(),
+            'liste_non_conformes': archive.get_liste_non_conformes(),
+            'liste_non_references': archive.get_liste_non_references(),
+            'date_debut_periode': archive.date_debut_periode,
+            'date_fin_periode': archive.date_fin_periode
+        }
+        return generate_pdf_report_archive(conformite, archive)
     
-    pdf_buffer = generate_pdf_report_archive(conformite, archive)
+    pdf_file = _cached_archive_export(archive, 'pdf', build)
     
-    if pdf_buffer:
-        response = make_response(pdf_buffer.getvalue())
-        response.headers['Content-Type'] = 'application/pdf'
+    if pdf_file:
         filename = f'archive_{archive.date_debut_periode.strftime("%Y%m%d")}_to_{archive.date_fin_periode.strftime("%Y%m%d")}.pdf'
-        response.headers['Content-Disposition'] = f'attachment; filename={filename}'
-        return response
+        return send_file(pdf_file, mimetype='application/pdf', as_attachment=True, download_name=filename)
     
     flash('Erreur génération PDF.', 'danger')
     return redirect(request.referrer or url_for('archives.quotidiennes'))
@@ -127,24 +179,28 @@ def excel(id):
     """Télécharger l'Excel d'une archive"""
     archive = ArchiveConformite.query.get_or_404(id)
     
-    conformite = {
-        'total_cmdb': archive.total_cmdb,
-        'total_backup_enabled': archive.total_backup_enabled,
-        'total_jobs': archive.total_jobs,
-        'taux_conformite': archive.taux_conformite,
-        'liste_conformes': archive.get_liste_conformes(),
-        'liste_non_conformes': archive.get_liste_non_conformes(),
-        'liste_non_references': archive.get_liste_non_references(),
-    }
+    def build():
+        conformite = {
+            'total_cmdb': archive.total_cmdb,
+            'total_backup_enabled': archive.total_backup_enabled,
+            'total_jobs': archive.total_jobs,
+            'taux_conformite': archive.taux_conformite,
+            'liste_conformes': archive.get_liste_conformes(),
+            'liste_non_conformes': archive.get_liste_non_conformes(),
+            'liste_non_references': archive.get_liste_non_references(),
+        }
+        return generate_excel_report_archive(conformite, archive)
     
-    excel_buffer = generate_excel_report_archive(conformite, archive)
+    excel_file = _cached_archive_export(archive, 'xlsx', build)
     
-    if excel_buffer:
-        response = make_response(excel_buffer.getvalue())
-        response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    if excel_file:
         filename = f'archive_{archive.date_debut_periode.strftime("%Y%m%d")}_to_{archive.date_fin_periode.strftime("%Y%m%d")}.xlsx'
-        response.headers['Content-Disposition'] = f'attachment; filename={filename}'
-        return response
+        return send_file(
+            excel_file,
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            as_attachment=True,
+            download_name=filename
+        )
     
     flash('Erreur génération Excel.', 'danger')
     return redirect(request.referrer or url_for('archives.quotidiennes'))
@@ -157,5 +213,6 @@ def delete(id):
     archive = ArchiveConformite.query.get_or_404(id)
     db.session.delete(archive)
     db.session.commit()
+    _delete_archive_exports(id)
     flash('Archive supprimée avec succès.', 'success')
     return redirect(request.referrer or url_for('archives.quotidiennes'))
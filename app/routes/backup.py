@@ -7,7 +7,7 @@ Support du rechargement dynamique du scheduler via Redis pub/sub
 from datetime import datetime
 from flask import Blueprint, render_template, request, flash, redirect, url_for, send_from_directory, jsonify
 from flask_login import login_required, current_user
-from app.services.backup_service import BackupService
+from app.services.backup_service import get_backup_service
 from app.services.cache_service import CacheService
 from app.services.config_service import get_config, set_config
 from functools import wraps
@@ -27,7 +27,7 @@ def admin_required(f):
 
 def _get_backup_data():
     """Helper pour récupérer les données de backup"""
-    backup_service = BackupService()
+    backup_service = get_backup_service()
     cache_service = CacheService()
     return {
         'backups': backup_service.list_backups(),
@@ -145,7 +145,7 @@ def restore(filename):
         return redirect(url_for('backup.restore_status'))
     
     # Démarrer la restauration asynchrone
-    backup_service = BackupService()
+    backup_service = get_backup_service()
     # ✅ FIX: Passer current_app directement sans _get_current_object()
     result = async_restore.start_restore_db(filename, backup_service, current_app)
     
@@ -333,7 +333,7 @@ def create():
     """Créer une nouvelle sauvegarde DB"""
     description = request.form.get('description', '').strip()
     
-    backup_service = BackupService()
+    backup_service = get_backup_service()
     result = backup_service.create_backup(description)
     
     if result['success']:
@@ -353,7 +353,7 @@ def create_fs():
     # Créer une config pour passer les directories
     config = {'directories': directories}
     
-    backup_service = BackupService()
+    backup_service = get_backup_service()
     result = backup_service.create_fs_backup(description, config)
     
     if result['success']:
@@ -373,7 +373,7 @@ def restore_fs_extract(filename):
         flash('⚠️ Extraction annulée : confirmation requise', 'warning')
         return redirect(url_for('backup.restore_fs'))
     
-    backup_service = BackupService()
+    backup_service = get_backup_service()
     result = backup_service.restore_fs_backup(filename)
     
     if result['success']:
@@ -387,7 +387,7 @@ def restore_fs_extract(filename):
 @admin_required
 def delete(filename):
     """Supprimer une sauvegarde"""
-    backup_service = BackupService()
+    backup_service = get_backup_service()
     result = backup_service.delete_backup(filename)
     
     if result['success']:
@@ -401,7 +401,7 @@ def delete(filename):
 @admin_required
 def download(filename):
     """Télécharger une sauvegarde"""
-    backup_service = BackupService()
+    backup_service = get_backup_service()
     
     # Chercher le fichier dans les deux répertoires
     if (backup_service.backup_db_dir / filename).exists():
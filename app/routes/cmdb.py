@@ -2,12 +2,15 @@
 NBCM V2.5 - Routes CMDB
 Gestion du référentiel serveurs
 """
-import io
 import os
 import csv
+import hashlib
+import tempfile
 from datetime import datetime, timedelta
-from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, current_app
+from flask import (Blueprint, render_template, request, redirect, url_for, flash, send_file, current_app,
+                   after_this_request, make_response, session, Response)
 from flask_login import login_required, current_user
+from sqlalchemy import func, case
 from werkzeug.utils import secure_filename
 
 from app import db, cache
@@ -15,9 +18,41 @@ from app.models.cmdb import ReferentielCMDB, CMDBHistory
 from app.models.jobs import ImportHistory
 from app.services.import_service import import_cmdb_file
 from app.routes.auth import operator_required
+from app.services.translations import get_user_language
 
 cmdb_bp = Blueprint('cmdb', __name__)
 
+# Durée de vie du rendu HTML de la liste CMDB en cache
+CMDB_LIST_CACHE_TIMEOUT = 300
+
+
+def _cmdb_etag(*extra):
+    """
+    ETag du référentiel calculé en une seule requête agrégée :
+    dernière modification, nombre de serveurs et nombre de désactivations en cours
+    (ce dernier évolue avec le temps sans modification en base).
+    """
+    derniere_modif, total, nb_desactives = db.session.query(
+        func.max(ReferentielCMDB.date_modification),
+        func.count(ReferentielCMDB.id),
+        func.sum(case((ReferentielCMDB.desactive_temporairement, 1), else_=0))
+    ).one()
+    material = '|'.join(str(part) for part in (derniere_modif, total, nb_desactives) + extra)
+    return hashlib.md5(material.encode('utf-8')).hexdigest()
+
+
+def _is_not_modified(etag):
+    """Vrai si le client possède déjà cette version (et qu'aucun message flash n'est en attente)"""
+    return request.if_none_match.contains_weak(etag) and not session.get('_flashes')
+
+
+def _not_modified_response(etag):
+    """Réponse 304 sans corps"""
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
 
 @cmdb_bp.route('/')
 @login_required
@@ -26,24 +61,42 @@ def list():
     filtre_backup = request.args.get('filtre_backup', 'tous')
     search = request.args.get('search', '')
     
-    query = ReferentielCMDB.query
-    
-    if filtre_backup == 'actif':
-        query = query.filter_by(backup_enabled=True)
-    elif filtre_backup == 'inactif':
-        query = query.filter_by(backup_enabled=False)
+    etag = _cmdb_etag(filtre_backup, search, current_user.id, get_user_language())
+    if _is_not_modified(etag):
+        return _not_modified_response(etag)
     
-    if search:
-        query = query.filter(ReferentielCMDB.hostname.ilike(f'%{search}%'))
+    # Rendu mis en cache par ETag : toute modification du référentiel change la clé.
+    # Pas de cache quand des messages flash sont en attente (ils sont inclus dans la page).
+    cache_key = f'cmdb:list:{etag}'
+    cacheable = not session.get('_flashes')
+    html = cache.get(cache_key) if cacheable else None
     
-    serveurs = query.order_by(ReferentielCMDB.hostname).all()
+    if html is None:
+        query = ReferentielCMDB.query
+        
+        if filtre_backup == 'actif':
+            query = query.filter_by(backup_enabled=True)
+        elif filtre_backup == 'inactif':
+            query = query.filter_by(backup_enabled=False)
+        
+        if search:
+            query = query.filter(ReferentielCMDB.hostname.ilike(f'%{search}%'))
+        
+        serveurs = query.order_by(ReferentielCMDB.hostname).all()
+        
+        html = render_template(
+            'cmdb/list.html',
+            serveurs=serveurs,
+            filtre_backup=filtre_backup,
+            search=search
+        )
+        if cacheable:
+            cache.set(cache_key, html, timeout=CMDB_LIST_CACHE_TIMEOUT)
     
-    return render_template(
-        'cmdb/list.html',
-        serveurs=serveurs,
-        filtre_backup=filtre_backup,
-        search=search
-    )
+    response = make_response(html)
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 
 @cmdb_bp.route('/import', methods=['GET', 'POST'])
@@ -88,30 +141,47 @@ def import_page():
 @login_required
 def export():
     """Export CSV du référentiel CMDB"""
-    serveurs = ReferentielCMDB.query.order_by(ReferentielCMDB.hostname).all()
+    export_date = datetime.now().strftime("%Y%m%d")
+    etag = _cmdb_etag('export', export_date)
+    if _is_not_modified(etag):
+        return _not_modified_response(etag)
     
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['hostname', 'Backup yes/no', 'comment', 'environnement', 'criticite', 'application'])
+    serveurs = ReferentielCMDB.query.order_by(ReferentielCMDB.hostname).all()
     
-    for s in serveurs:
-        writer.writerow([
-            s.hostname,
-            'yes' if s.backup_enabled else 'no',
-            s.commentaire or '',
-            s.environnement or '',
-            s.criticite or '',
-            s.application or ''
-        ])
+    # Écriture dans un fichier temporaire : send_file le transmet via
+    # wsgi.file_wrapper (sendfile) au lieu de matérialiser le CSV en mémoire
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', newline='', encoding='utf-8', delete=False) as tmp:
+        writer = csv.writer(tmp)
+        writer.writerow(['hostname', 'Backup yes/no', 'comment', 'environnement', 'criticite', 'application'])
+        
+        for s in serveurs:
+            writer.writerow([
+                s.hostname,
+                'yes' if s.backup_enabled else 'no',
+                s.commentaire or '',
+                s.environnement or '',
+                s.criticite or '',
+                s.application or ''
+            ])
     
-    output.seek(0)
+    @after_this_request
+    def remove_export_file(response):
+        try:
+            os.remove(tmp.name)
+        except OSError:
+            pass
+        return response
     
-    return send_file(
-        io.BytesIO(output.getvalue().encode('utf-8')),
+    response = send_file(
+        tmp.name,
         mimetype='text/csv',
         as_attachment=True,
-        download_name=f'cmdb_export_{datetime.now().strftime("%Y%m%d")}.csv'
+        download_name=f'cmdb_export_{export_date}.csv',
+        etag=False
     )
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 
 @cmdb_bp.route('/toggle/<int:id>', methods=['POST'])
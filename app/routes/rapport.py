@@ -5,7 +5,7 @@ Génération et export des rapports
 import io
 import csv
 from datetime import datetime
-from flask import Blueprint, render_template, request, redirect, url_for, flash, make_response, send_file, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, jsonify
 from flask_login import login_required, current_user
 
 from app import db, cache
@@ -14,7 +14,7 @@ from app.models.jobs import ImportHistory
 from app.models.compliance import HistoriqueConformite
 from app.services.compliance_service import calculer_conformite, get_historique_conformite
 from app.services.report_service import generate_pdf_report, generate_excel_report
-from app.services.email_service import send_email_report
+from app.services.email_service import send_email_reports
 from app.services.config_service import get_config
 
 rapport_bp = Blueprint('rapport', __name__)
@@ -47,10 +47,12 @@ def pdf():
     pdf_buffer = generate_pdf_report(conformite)
     
     if pdf_buffer:
-        response = make_response(pdf_buffer.getvalue())
-        response.headers['Content-Type'] = 'application/pdf'
-        response.headers['Content-Disposition'] = f'attachment; filename=rapport_conformite_{datetime.now().strftime("%Y%m%d")}.pdf'
-        return response
+        return send_file(
+            pdf_buffer,
+            mimetype='application/pdf',
+            as_attachment=True,
+            download_name=f'rapport_conformite_{datetime.now().strftime("%Y%m%d")}.pdf'
+        )
     
     flash('Erreur lors de la génération du PDF.', 'danger')
     return redirect(url_for('rapport.index'))
@@ -64,10 +66,12 @@ def excel():
     excel_buffer = generate_excel_report(conformite)
     
     if excel_buffer:
-        response = make_response(excel_buffer.getvalue())
-        response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        response.headers['Content-Disposition'] = f'attachment; filename=rapport_conformite_{datetime.now().strftime("%Y%m%d")}.xlsx'
-        return response
+        return send_file(
+            excel_buffer,
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            as_attachment=True,
+            download_name=f'rapport_conformite_{datetime.now().strftime("%Y%m%d")}.xlsx'
+        )
     
     flash('Erreur lors de la génération Excel.', 'danger')
     return redirect(url_for('rapport.index'))
@@ -82,8 +86,7 @@ def email():
         if not config.get('actif') or not config.get('email_to'):
             flash('Configuration email non active.', 'warning')
         else:
-            for dest in config['email_to'].split(','):
-                send_email_report(dest.strip())
+            send_email_reports([dest.strip() for dest in config['email_to'].split(',') if dest.strip()])
             flash('Rapport envoyé par email.', 'success')
     except Exception as e:
         flash(f'Erreur: {e}', 'danger')
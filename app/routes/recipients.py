@@ -8,6 +8,7 @@ from flask_login import login_required, current_user
 from app import db
 from app.models.compliance import Recipient
 from app.routes.auth import operator_required
+from app.services.scheduler_service import notify_email_schedule_changed
 
 recipients_bp = Blueprint('recipients', __name__)
 
@@ -34,6 +35,7 @@ def index():
             )
             db.session.add(recipient)
             db.session.commit()
+            notify_email_schedule_changed()
             flash(f'Destinataire {name} ajouté.', 'success')
     
     recipients = Recipient.query.order_by(Recipient.name).all()
@@ -47,6 +49,7 @@ def toggle(id):
     recipient = Recipient.query.get_or_404(id)
     recipient.active = not recipient.active
     db.session.commit()
+    notify_email_schedule_changed()
     flash(f"Destinataire {'activé' if recipient.active else 'désactivé'}.", 'success')
     return redirect(url_for('recipients.index'))
 
@@ -59,6 +62,7 @@ def delete(id):
     name = recipient.name
     db.session.delete(recipient)
     db.session.commit()
+    notify_email_schedule_changed()
     flash(f'Destinataire {name} supprimé.', 'success')
     return redirect(url_for('recipients.index'))
 
@@ -76,6 +80,7 @@ def edit(id):
         recipient.report_format = request.form.get('report_format', 'both')
         recipient.include_details = request.form.get('include_details') == 'on'
         db.session.commit()
+        notify_email_schedule_changed()
         flash('Destinataire mis à jour.', 'success')
         return redirect(url_for('recipients.index'))
     
@@ -2,7 +2,7 @@
 NBCM V2.5 - Services
 Export de tous les services
 """
-from app.services.config_service import get_config, set_config, init_default_configs
+from app.services.config_service import get_config, get_configs, set_config, init_default_configs, invalidate_config_cache
 from app.services.compliance_service import (
     calculer_conformite,
     invalidate_conformite_cache,
@@ -10,7 +10,8 @@ from app.services.compliance_service import (
     get_historique_conformite,
     get_trend_data,
     archiver_conformite_quotidienne,
-    normalize_hostname
+    normalize_hostname,
+    normalize_hostnames
 )
 from app.services.import_service import (
     import_altaview_file,
@@ -29,6 +30,7 @@ from app.services.report_service import (
 )
 from app.services.email_service import (
     send_email_report,
+    send_email_reports,
     send_test_email,
     check_scheduled_emails
 )
@@ -45,11 +47,11 @@ from app.services.external_import_service import (
 
 __all__ = [
     # Config
-    'get_config', 'set_config', 'init_default_configs',
+    'get_config', 'get_configs', 'set_config', 'init_default_configs', 'invalidate_config_cache',
     # Compliance
     'calculer_conformite', 'invalidate_conformite_cache', 'get_jobs_map',
     'get_historique_conformite', 'get_trend_data', 'archiver_conformite_quotidienne',
-    'normalize_hostname',
+    'normalize_hostname', 'normalize_hostnames',
     # Import
     'import_altaview_file', 'import_cmdb_file', 'supprimer_doublons_altaview',
     'detect_csv_format', 'detect_encoding', 'parse_date', 'parse_size',
@@ -57,7 +59,7 @@ __all__ = [
     'generate_excel_report', 'generate_pdf_report',
     'generate_pdf_report_archive', 'generate_excel_report_archive',
     # Email
-    'send_email_report', 'send_test_email', 'check_scheduled_emails',
+    'send_email_report', 'send_email_reports', 'send_test_email', 'check_scheduled_emails',
     # Scheduler
     'init_scheduler', 'get_scheduler_status', 'reschedule_archive',
     # External Import
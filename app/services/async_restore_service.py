@@ -5,15 +5,16 @@ Gestion des restaurations DB avec suivi de progression et logs en temps réel
 ✅ FIX: RLock pour éviter deadlocks + logging sans current_app
 ✅ FIX: Plus besoin d'app_context dans le thread
 """
+import os
 import threading
 import time
 import subprocess
-import gzip
-import shutil
 import logging
 from datetime import datetime
 from pathlib import Path
 
+from app.services.backup_service import read_meta, restore_sqlite_file, decompress_to_temp
+
 
 class RestoreTask:
     """Représente une tâche de restauration en cours"""
@@ -122,41 +123,19 @@ class AsyncRestoreService:
             task.progress = 20
             
             # Lire métadonnées
-            meta_file = filepath.with_suffix('.gz.meta')
-            db_type = 'postgresql'
-            
-            if meta_file.exists():
-                with open(meta_file) as f:
-                    for line in f:
-                        if line.startswith('db_type='):
-                            db_type = line.strip().split('=')[1]
+            db_type = read_meta(f"{filepath}.meta").get('db_type', 'postgresql')
             
             task.add_log(f'📊 Type de base: {db_type}')
             task.progress = 30
             
-            # Décompression
-            task.message = 'Décompression du backup...'
-            task.add_log('📦 Décompression en cours...')
-            
-            sql_file = filepath.with_suffix('')
-            with gzip.open(filepath, 'rb') as f_in:
-                with open(sql_file, 'wb') as f_out:
-                    shutil.copyfileobj(f_in, f_out)
-            
-            task.add_log(f'✅ Fichier décompressé: {sql_file.name}')
+            # Restauration (décompression à la volée, sans fichier temporaire)
             task.progress = 50
-            
-            # Restauration
             if db_type == 'postgresql':
                 task.message = 'Restauration PostgreSQL...'
-                result = self._restore_postgres(sql_file, backup_service.db_config, task)
+                result = self._restore_postgres(filepath, backup_service.db_config, task)
             else:
                 task.message = 'Restauration SQLite...'
-                result = self._restore_sqlite(sql_file, backup_service.db_config, task)
-            
-            # Nettoyage
-            sql_file.unlink()
-            task.add_log('🧹 Fichier temporaire supprimé')
+                result = self._restore_sqlite(filepath, backup_service.db_config, task)
             
             if result['success']:
                 task.status = 'completed'
@@ -183,9 +162,18 @@ class AsyncRestoreService:
                 if self.current_task == task:
                     self.current_task = None
     
-    def _restore_postgres(self, sql_file, db_config, task):
+    def _restore_postgres(self, filepath, db_config, task):
         """Restaure PostgreSQL avec logs détaillés + terminaison connexions actives"""
+        sql_path = None
+        process = None
         try:
+            # Décompression complète et vérifiée AVANT de toucher la base :
+            # une archive tronquée ou corrompue échoue ici
+            task.add_log('📦 Décompression et vérification du dump...')
+            task.message = 'Décompression du dump...'
+            sql_path = decompress_to_temp(filepath)
+            task.add_log('✅ Dump décompressé et vérifié')
+            
             task.add_log('🐘 Connexion à PostgreSQL...')
             task.progress = 55
             
@@ -248,26 +236,27 @@ class AsyncRestoreService:
                 '-p', db_config['port'],
                 '-U', db_config['user'],
                 '-d', db_config['database'],
-                '-f', str(sql_file),
                 '-v', 'ON_ERROR_STOP=1'  # Arrêter en cas d'erreur
             ]
             
-            task.add_log(f'📝 Commande: psql -h {db_config["host"]} -d {db_config["database"]} -f {sql_file.name}')
+            task.add_log(f'📝 Commande: psql -h {db_config["host"]} -d {db_config["database"]} < {filepath.name}')
             task.progress = 70
             
-            # Exécuter avec capture des logs
-            process = subprocess.Popen(
-                cmd,
-                env=env,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
+            # Exécuter avec capture des logs, sur le dump décompressé et vérifié
+            with open(sql_path, 'rb') as sql_file:
+                process = subprocess.Popen(
+                    cmd,
+                    env=env,
+                    stdin=sql_file,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE
+                )
             
             # Lire stderr en temps réel pour progression
             stderr_lines = []  # ✅ AJOUT
             lines_processed = 0
-            for line in process.stderr:
+            for raw_line in process.stderr:
+                line = raw_line.decode('utf-8', errors='replace')
                 stderr_lines.append(line)  # ✅ AJOUT
                 lines_processed += 1
                 if lines_processed % 100 == 0:  # Log toutes les 100 lignes
@@ -277,8 +266,6 @@ class AsyncRestoreService:
             # Attendre la fin
             returncode = process.wait(timeout=900)  # 15 minutes max
             
-            # stdout, stderr = process.communicate()
-            stdout = process.stdout.read()
             stderr = ''.join(stderr_lines)  # ✅ CHANGEMEN
             
             if returncode != 0:
@@ -304,8 +291,17 @@ class AsyncRestoreService:
             traceback_str = traceback.format_exc()
             task.add_log(f'Traceback: {traceback_str[:500]}', 'error')
             return {'success': False, 'error': str(e)}
+        finally:
+            if process and process.poll() is None:
+                process.kill()
+                process.wait()
+            if sql_path:
+                try:
+                    os.unlink(sql_path)
+                except OSError:
+                    pass
     
-    def _restore_sqlite(self, sql_file, db_config, task):
+    def _restore_sqlite(self, filepath, db_config, task):
         """Restaure SQLite"""
         try:
             task.add_log('📄 Restauration SQLite...')
@@ -313,8 +309,8 @@ class AsyncRestoreService:
             
             sqlite_path = db_config['path']
             
-            # Copie vers destination
-            shutil.copy2(sql_file, sqlite_path)
+            # Décompression dans un fichier temporaire, vérifié avant de remplacer la base
+            restore_sqlite_file(filepath, sqlite_path)
             
             task.add_log('✅ SQLite restauré', 'success')
             task.progress = 95
@@ -11,6 +11,19 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+def iter_files_with_stat(directory):
+    """
+    Parcourt récursivement un répertoire avec os.scandir.
+    Renvoie (chemin, stat) pour chaque fichier : un seul stat par fichier.
+    """
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_files_with_stat(entry.path)
+            elif entry.is_file():
+                yield entry.path, entry.stat()
+
+
 class CleanupService:
     """Service de nettoyage automatique des fichiers"""
     
@@ -130,17 +143,13 @@ class CleanupService:
         
         cutoff_time = time.time() - self.retention_seconds
         
-        for file_path in self.base_dir.rglob('*'):
-            if not file_path.is_file():
-                continue
-            
-            file_size = file_path.stat().st_size
+        for _, st in iter_files_with_stat(self.base_dir):
             stats['total_files'] += 1
-            stats['total_size'] += file_size
+            stats['total_size'] += st.st_size
             
-            if file_path.stat().st_mtime < cutoff_time:
+            if st.st_mtime < cutoff_time:
                 stats['eligible_for_deletion'] += 1
-                stats['eligible_size'] += file_size
+                stats['eligible_size'] += st.st_size
         
         # Convertir en MB
         stats['total_size_mb'] = round(stats['total_size'] / (1024 * 1024), 2)
@@ -3,9 +3,11 @@ NBCM V2.5 - Service Conformité
 Calcul et gestion de la conformité des backups
 """
 import json
+from functools import lru_cache
 from datetime import datetime, timedelta
 from collections import defaultdict
 from flask import current_app
+from sqlalchemy import select
 
 from app import db, cache
 from app.models.cmdb import ReferentielCMDB
@@ -14,10 +16,17 @@ from app.models.compliance import HistoriqueConformite, ArchiveConformite
 from app.services.config_service import get_config
 
 
+# Suffixes / préfixes de backup courants (appliqués dans cet ordre)
+HOSTNAME_SUFFIXES = ('_bkp', '_backup', '_prod', '_test', '_dev', '_dr', '_snap', '_clone')
+HOSTNAME_PREFIXES = ('bkp_', 'backup_')
+
+
+@lru_cache(maxsize=4096)
 def normalize_hostname(hostname):
     """
     Normalise un hostname pour la comparaison.
     Amélioration: gestion des cas spéciaux NetBackup.
+    Résultat mémorisé : un export répète le même client sur de nombreuses lignes.
     """
     if not hostname:
         return ""
@@ -33,20 +42,28 @@ def normalize_hostname(hostname):
         normalized = normalized.split('@')[0]
     
     # Supprimer les suffixes de backup courants
-    suffixes = ['_bkp', '_backup', '_prod', '_test', '_dev', '_dr', '_snap', '_clone']
-    for suffix in suffixes:
+    for suffix in HOSTNAME_SUFFIXES:
         if normalized.endswith(suffix):
             normalized = normalized[:-len(suffix)]
     
     # Supprimer les préfixes de backup
-    prefixes = ['bkp_', 'backup_']
-    for prefix in prefixes:
+    for prefix in HOSTNAME_PREFIXES:
         if normalized.startswith(prefix):
             normalized = normalized[len(prefix):]
     
     return normalized
 
 
+def normalize_hostnames(hostnames):
+    """
+    Normalise une liste de hostnames en une passe.
+    Chaque valeur distincte n'est normalisée qu'une fois (les jobs d'un même
+    serveur répètent le même hostname).
+    """
+    normalized = {h: normalize_hostname(h) for h in set(hostnames)}
+    return [normalized[h] for h in hostnames]
+
+
 @cache.cached(timeout=60, key_prefix='conformite')
 def calculer_conformite(periode_heures=24):
     """
@@ -57,10 +74,10 @@ def calculer_conformite(periode_heures=24):
         date_limite = datetime.now() - timedelta(hours=periode_heures)
         
         # Récupérer les serveurs actifs (non désactivés temporairement)
-        serveurs_actifs = [
-            s for s in ReferentielCMDB.query.filter_by(backup_enabled=True).all()
-            if not s.est_desactive_temporairement()
-        ]
+        serveurs_actifs = ReferentielCMDB.query.filter(
+            ReferentielCMDB.backup_enabled.is_(True),
+            ~ReferentielCMDB.desactive_temporairement
+        ).all()
         
         # Récupérer les jobs récents
         jobs_recents = JobAltaview.query.filter(
@@ -173,19 +190,35 @@ def invalidate_conformite_cache():
     cache.delete('conformite')
 
 
+# Colonnes utilisées par les rapports (évite de charger les entités ORM complètes)
+REPORT_JOB_COLUMNS = (
+    JobAltaview.hostname,
+    JobAltaview.backup_time,
+    JobAltaview.job_id,
+    JobAltaview.policy_name,
+    JobAltaview.schedule_name,
+    JobAltaview.status,
+    JobAltaview.taille_gb,
+    JobAltaview.duree_minutes,
+)
+
+
 def get_jobs_map(hours=24):
     """
     Retourne un mapping des jobs par hostname normalisé.
+    Une seule requête sur les colonnes utiles aux rapports ; le regroupement
+    reste en Python car normalize_hostname n'a pas d'équivalent SQL portable.
     """
     date_limite = datetime.now() - timedelta(hours=hours)
-    jobs = JobAltaview.query.filter(
-        JobAltaview.backup_time >= date_limite
-    ).order_by(JobAltaview.backup_time.desc()).all()
+    rows = db.session.execute(
+        select(*REPORT_JOB_COLUMNS)
+        .where(JobAltaview.backup_time >= date_limite)
+        .order_by(JobAltaview.backup_time.desc())
+    ).all()
     
     jobs_map = defaultdict(list)
-    for job in jobs:
-        norm_name = normalize_hostname(job.hostname)
-        jobs_map[norm_name].append(job)
+    for norm_name, row in zip(normalize_hostnames([row.hostname for row in rows]), rows):
+        jobs_map[norm_name].append(row)
     
     return jobs_map
 
@@ -280,10 +313,10 @@ def archiver_conformite_quotidienne(force_now=False):
         )
         
         # Récupérer les données
-        serveurs_actifs = [
-            s for s in ReferentielCMDB.query.filter_by(backup_enabled=True).all()
-            if not s.est_desactive_temporairement()
-        ]
+        serveurs_actifs = ReferentielCMDB.query.filter(
+            ReferentielCMDB.backup_enabled.is_(True),
+            ~ReferentielCMDB.desactive_temporairement
+        ).all()
         
         jobs_periode = JobAltaview.query.filter(
             JobAltaview.backup_time >= date_debut,
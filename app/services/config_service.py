@@ -3,21 +3,113 @@ NBCM V2.5 - Service Configuration
 Gestion des paramètres système
 """
 import json
+import time
 from datetime import datetime
+from flask import has_request_context
 
 from app import db
 from app.models.compliance import Configuration
 
 
+# Cache par clé : {cle: (horodatage, valeur texte ou None, valeur décodée)}
+# Invalidé localement par set_config/delete_config et dans le processus du
+# scheduler via le signal Redis 'config:<cle>'.
+# Il ne sert qu'hors requête HTTP (tâches planifiées) : les workers web n'en
+# reçoivent pas les invalidations et lisent toujours la base.
+CONFIG_CACHE_TTL = 60
+_CONFIG_CACHE = {}
+_NON_DECODE = object()
+
+
+def invalidate_config_cache(cle=None):
+    """Invalide le cache de configuration (une clé ou tout le cache)"""
+    if cle is None:
+        _CONFIG_CACHE.clear()
+    else:
+        _CONFIG_CACHE.pop(cle, None)
+
+
+def _decode_config(valeur):
+    """Désérialise une valeur brute de configuration"""
+    try:
+        return json.loads(valeur)
+    except:
+        return valeur
+
+
+def _cached_value(cle, now):
+    """Entrée du cache encore valide pour `cle`, ou None (toujours None pendant une requête)"""
+    if has_request_context():
+        return None
+    cached = _CONFIG_CACHE.get(cle)
+    if cached is not None and now - cached[0] < CONFIG_CACHE_TTL:
+        return cached
+    return None
+
+
+def _from_cache(entry, defaut):
+    """
+    Valeur décodée d'une entrée du cache.
+    Les scalaires sont décodés une seule fois ; les dict/list sont redécodés
+    à chaque appel pour que l'appelant puisse les modifier sans risque.
+    """
+    cle, (ts, valeur, decodee) = entry
+    if valeur is None:
+        return defaut
+    if decodee is _NON_DECODE:
+        decodee = _decode_config(valeur)
+        _CONFIG_CACHE[cle] = (ts, valeur, decodee)
+    if isinstance(decodee, (dict, list)):
+        return json.loads(valeur)
+    return decodee
+
+
 def get_config(cle, defaut=None):
-    """Récupère une valeur de configuration"""
-    config = Configuration.query.filter_by(cle=cle).first()
-    if config:
-        try:
-            return json.loads(config.valeur)
-        except:
-            return config.valeur
-    return defaut
+    """
+    Récupère une valeur de configuration.
+    Hors requête HTTP, la valeur est mise en cache CONFIG_CACHE_TTL secondes.
+    """
+    now = time.monotonic()
+    cached = _cached_value(cle, now)
+    if cached is None:
+        config = Configuration.query.filter_by(cle=cle).first()
+        cached = (now, config.valeur if config else None, _NON_DECODE)
+        _CONFIG_CACHE[cle] = cached
+    
+    return _from_cache((cle, cached), defaut)
+
+
+def get_configs(cles, defaut=None):
+    """
+    Récupère plusieurs valeurs de configuration en une seule requête.
+    Les clés absentes du cache sont lues ensemble (WHERE cle IN (...)).
+    
+    Returns:
+        dict {cle: valeur}
+    """
+    now = time.monotonic()
+    cles = list(cles)
+    manquantes = [cle for cle in cles if _cached_value(cle, now) is None]
+    
+    if manquantes:
+        trouvees = dict(
+            db.session.query(Configuration.cle, Configuration.valeur)
+            .filter(Configuration.cle.in_(manquantes))
+            .all()
+        )
+        for cle in manquantes:
+            _CONFIG_CACHE[cle] = (now, trouvees.get(cle), _NON_DECODE)
+    
+    return {cle: _from_cache((cle, _CONFIG_CACHE[cle]), defaut) for cle in cles}
+
+
+def _signal_config_change(cle):
+    """Prévient le processus du scheduler qu'une configuration a changé"""
+    try:
+        from app.services.scheduler_reload_service import get_reload_service
+        get_reload_service().signal_event(f'config:{cle}')
+    except Exception:
+        pass
 
 
 def set_config(cle, valeur, description=None, updated_by='system'):
@@ -26,10 +118,7 @@ def set_config(cle, valeur, description=None, updated_by='system'):
     if not config:
         config = Configuration(cle=cle)
     
-    if isinstance(valeur, (dict, list)):
-        config.valeur = json.dumps(valeur)
-    else:
-        config.valeur = str(valeur)
+    config.set_value(valeur)
     
     if description:
         config.description = description
@@ -39,6 +128,8 @@ def set_config(cle, valeur, description=None, updated_by='system'):
     
     db.session.add(config)
     db.session.commit()
+    invalidate_config_cache(cle)
+    _signal_config_change(cle)
     return config
 
 
@@ -48,6 +139,8 @@ def delete_config(cle):
     if config:
         db.session.delete(config)
         db.session.commit()
+        invalidate_config_cache(cle)
+        _signal_config_change(cle)
         return True
     return False
 
@@ -17,27 +17,34 @@ from app.services.config_service import get_config
 from app.services.compliance_service import calculer_conformite
 from app.services.report_service import generate_pdf_report, generate_excel_report
 
+# Durée (s) du verrou Redis posé par destinataire avant un envoi programmé
+SCHEDULED_EMAIL_DEDUP_TTL = 300
+
+
+def _report_attachments(conformite):
+    """Pièces jointes du rapport (générées une seule fois par envoi groupé)"""
+    attachments = []
+    
+    pdf = generate_pdf_report(conformite)
+    if pdf:
+        attachments.append(('pdf', 'report.pdf', pdf.read()))
+    
+    excel = generate_excel_report(conformite)
+    if excel:
+        attachments.append(('vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'report.xlsx', excel.read()))
+    
+    return attachments
 
-def send_email_report(recipient_email, recipient_name=None):
-    """
-    Envoie un rapport de conformité par email.
-    """
-    try:
-        config = get_config('email_rapport', {})
-        
-        if not config.get('actif'):
-            current_app.logger.warning("Envoi email désactivé")
-            return False
-        
-        conformite = calculer_conformite()
-        
-        msg = MIMEMultipart()
-        msg['From'] = config['email_from']
-        msg['To'] = recipient_email
-        msg['Subject'] = f"NetBackup Report - {datetime.now().strftime('%d/%m/%Y')}"
-        msg['Date'] = formatdate(localtime=True)
-        
-        body = f"""Hello,
+
+def _report_message(config, conformite, attachments, recipient_email):
+    """Construit l'email de rapport pour un destinataire"""
+    msg = MIMEMultipart()
+    msg['From'] = config['email_from']
+    msg['To'] = recipient_email
+    msg['Subject'] = f"NetBackup Report - {datetime.now().strftime('%d/%m/%Y')}"
+    msg['Date'] = formatdate(localtime=True)
+    
+    body = f"""Hello,
 
 Here is the backup compliance report for {datetime.now().strftime('%d/%m/%Y')}.
 
@@ -50,42 +57,78 @@ Statistics:
 Regards,
 NetBackup Compliance Manager
 """
-        msg.attach(MIMEText(body, 'plain'))
+    msg.attach(MIMEText(body, 'plain'))
+    
+    for subtype, filename, payload in attachments:
+        part = MIMEBase('application', subtype)
+        part.set_payload(payload)
+        encoders.encode_base64(part)
+        part.add_header('Content-Disposition', f'attachment; filename="{filename}"')
+        msg.attach(part)
+    
+    return msg
+
+
+def send_email_reports(recipient_emails):
+    """
+    Envoie le rapport de conformité à plusieurs destinataires.
+    La conformité et les pièces jointes sont calculées une seule fois et tous
+    les emails partent sur la même connexion SMTP.
+    
+    Returns:
+        dict {email: True/False}
+    """
+    results = {email: False for email in recipient_emails}
+    if not results:
+        return results
+    
+    try:
+        config = get_config('email_rapport', {})
         
-        pdf = generate_pdf_report(conformite)
-        if pdf:
-            p = MIMEBase('application', 'pdf')
-            p.set_payload(pdf.getvalue())
-            encoders.encode_base64(p)
-            p.add_header('Content-Disposition', 'attachment; filename="report.pdf"')
-            msg.attach(p)
+        if not config.get('actif'):
+            current_app.logger.warning("Envoi email désactivé")
+            return results
         
-        excel = generate_excel_report(conformite)
-        if excel:
-            x = MIMEBase('application', 'vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-            x.set_payload(excel.getvalue())
-            encoders.encode_base64(x)
-            x.add_header('Content-Disposition', 'attachment; filename="report.xlsx"')
-            msg.attach(x)
+        conformite = calculer_conformite()
+        attachments = _report_attachments(conformite)
         
         server = smtplib.SMTP(config['smtp_server'], int(config['smtp_port']))
-        server.starttls()
-        server.login(config['smtp_user'], config['smtp_password'])
-        server.send_message(msg)
-        server.quit()
-        
-        # Mettre à jour last_sent pour le recipient
-        recipient = Recipient.query.filter_by(email=recipient_email).first()
-        if recipient:
-            recipient.last_sent = datetime.now()
-            db.session.commit()
-        
-        current_app.logger.info(f"[EMAIL] ✅ Sent successfully to {recipient_email}")
-        return True
+        try:
+            server.starttls()
+            server.login(config['smtp_user'], config['smtp_password'])
+            
+            for recipient_email in results:
+                try:
+                    server.send_message(_report_message(config, conformite, attachments, recipient_email))
+                    results[recipient_email] = True
+                    current_app.logger.info(f"[EMAIL] ✅ Sent successfully to {recipient_email}")
+                except smtplib.SMTPException as e:
+                    current_app.logger.error(f"[EMAIL] ❌ Error sending to {recipient_email}: {e}")
+        finally:
+            try:
+                server.quit()
+            except smtplib.SMTPException:
+                pass
         
     except Exception as e:
         current_app.logger.error(f"[EMAIL] ❌ Error sending: {e}")
-        return False
+    
+    # Mettre à jour last_sent des destinataires servis
+    sent = [email for email, ok in results.items() if ok]
+    if sent:
+        now = datetime.now()
+        for recipient in Recipient.query.filter(Recipient.email.in_(sent)).all():
+            recipient.last_sent = now
+        db.session.commit()
+    
+    return results
+
+
+def send_email_report(recipient_email, recipient_name=None):
+    """
+    Envoie un rapport de conformité par email.
+    """
+    return send_email_reports([recipient_email])[recipient_email]
 
 
 def send_test_email(recipient_email):
@@ -136,6 +179,7 @@ def check_scheduled_emails():
     PROTECTION ANTI-DOUBLON :
     - Utilise un lock Redis pour éviter l'exécution simultanée
     - Vérifie last_sent pour ne pas renvoyer dans les 5 minutes
+    - Pose un verrou Redis (SET NX) par destinataire avant l'envoi
     """
     # 🔒 LOCK REDIS pour éviter l'exécution simultanée par plusieurs workers
     from app.services.lock_service import get_lock_service
@@ -160,6 +204,7 @@ def check_scheduled_emails():
         
         current_app.logger.info(f"[EMAIL] 🔍 Vérification programmée à {current_time} - {len(recipients)} destinataire(s) trouvé(s)")
         
+        to_send = []
         for recipient in recipients:
             # 🛡️ VÉRIFICATION ANTI-DOUBLON : Ne pas renvoyer si envoyé il y a moins de 5 minutes
             if recipient.last_sent:
@@ -170,14 +215,22 @@ def check_scheduled_emails():
                     )
                     continue
             
-            # Envoyer l'email
-            current_app.logger.info(f"[EMAIL] 📧 Envoi programmé à {recipient.email} ({recipient.name})")
-            success = send_email_report(recipient.email, recipient.name)
+            # 🔒 Un seul envoi par destinataire, même si un autre passage tourne en parallèle
+            if not lock_service.acquire_lock(f'scheduled_email:{recipient.email}', ttl=SCHEDULED_EMAIL_DEDUP_TTL):
+                current_app.logger.info(f"[EMAIL] ⏭️ SKIP {recipient.email} - Envoi déjà pris en charge")
+                continue
             
+            current_app.logger.info(f"[EMAIL] 📧 Envoi programmé à {recipient.email} ({recipient.name})")
+            to_send.append(recipient.email)
+        
+        # Envoi groupé : un seul calcul du rapport et une seule connexion SMTP
+        for email, success in send_email_reports(to_send).items():
             if success:
-                current_app.logger.info(f"[EMAIL] ✅ Email envoyé avec succès à {recipient.email}")
+                current_app.logger.info(f"[EMAIL] ✅ Email envoyé avec succès à {email}")
             else:
-                current_app.logger.error(f"[EMAIL] ❌ Échec envoi à {recipient.email}")
+                current_app.logger.error(f"[EMAIL] ❌ Échec envoi à {email}")
+                # Libérer le verrou pour permettre un nouvel essai
+                lock_service.release_lock(f'scheduled_email:{email}')
     
     except Exception as e:
         current_app.logger.error(f"[EMAIL] ❌ Erreur vérification emails programmés: {e}", exc_info=True)
@@ -3,64 +3,197 @@ NBCM V2.5 - Service Import Externe
 Import depuis IMAP et API Altaview
 """
 import os
+import re
+import errno
+import fcntl
+import shutil
+import time
+import atexit
+import binascii
 import imaplib
 import email
+import quopri
 import secrets
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime
 from email.header import decode_header
 from flask import current_app
 
 from app import db
 from app.models.jobs import JobAltaview, ImportHistory
-from app.services.config_service import get_config
+from app.services.config_service import get_config, set_config
 from app.services.import_service import import_altaview_file, normalize_hostname
 
+# Connexions IMAP réutilisées d'un cycle à l'autre : {(server, user): {'client', 'password', 'last_used'}}
+IMAP_TIMEOUT = 30
+IMAP_NOOP_AFTER = 300
+IMAP_FETCH_BATCH = 50
+IMAP_ATTACHMENT_EXTENSIONS = ('.csv', '.txt', '.xlsx')
+IMAP_DECODE_CHUNK = 64 * 1024
+IMAP_PROBE_BYTES = 64
+# Octets de contrôle absents d'un fichier texte (hors tabulation et fins de ligne)
+_BINARY_BYTES = frozenset(range(0x20)) - {0x09, 0x0a, 0x0d}
+# Clé de configuration du plus haut UID IMAP déjà traité
+IMAP_STATE_KEY = 'email_import_state'
+_IMAP_POOL = {}
+_IMAP_LOCK = threading.Lock()
+
+# Session HTTP partagée pour l'API Altaview : connexions TLS conservées (keep-alive)
+# et nouvelles tentatives automatiques sur erreurs transitoires
+_API_SESSION = requests.Session()
+_api_adapter = HTTPAdapter(max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=(502, 503, 504)))
+_API_SESSION.mount('https://', _api_adapter)
+_API_SESSION.mount('http://', _api_adapter)
+
+
+def _drop_imap(key):
+    """Ferme et oublie une connexion IMAP du pool"""
+    entry = _IMAP_POOL.pop(key, None)
+    if entry:
+        try:
+            entry['client'].logout()
+        except Exception:
+            pass
+
+
+def _get_imap(server, user, password):
+    """
+    Retourne une connexion IMAP authentifiée, réutilisée si possible.
+    Une connexion inactive depuis plus de IMAP_NOOP_AFTER secondes est vérifiée
+    par un NOOP ; en cas d'échec elle est recréée.
+    """
+    key = (server, user)
+    entry = _IMAP_POOL.get(key)
+    now = time.monotonic()
+    
+    if entry and entry['password'] != password:
+        _drop_imap(key)
+        entry = None
+    
+    if entry and now - entry['last_used'] > IMAP_NOOP_AFTER:
+        try:
+            entry['client'].noop()
+        except (imaplib.IMAP4.abort, imaplib.IMAP4.error, OSError):
+            _drop_imap(key)
+            entry = None
+    
+    if entry is None:
+        client = imaplib.IMAP4_SSL(server, timeout=IMAP_TIMEOUT)
+        client.login(user, password)
+        entry = {'client': client, 'password': password}
+        _IMAP_POOL[key] = entry
+    
+    entry['last_used'] = now
+    return entry['client']
+
+
+@atexit.register
+def _close_imap_pool():
+    """Déconnexion propre des sessions IMAP à l'arrêt du processus"""
+    for key in list(_IMAP_POOL):
+        _drop_imap(key)
+
+
+# Dernier parcours du dossier d'auto-import : {dossier: (mtime du dossier, horodatage)}
+AUTO_IMPORT_FULL_SCAN_INTERVAL = 600
+_AUTO_IMPORT_SCAN = {}
+
+
+def _move_file(src, dst):
+    """
+    Déplace un fichier par un simple rename (atomique sur un même système de
+    fichiers, ce qui sert de verrou entre workers) ; copie seulement si la
+    destination est sur un autre système de fichiers.
+    """
+    try:
+        os.rename(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(src, dst)
+
+
+def _claim_file(filepath, processing_path):
+    """
+    Réserve un fichier à importer : verrou flock non bloquant sur le fichier
+    (échec immédiat si un autre worker le détient), puis déplacement dans
+    processing/. Retourne False si le fichier est déjà pris.
+    """
+    try:
+        fd = os.open(filepath, os.O_RDONLY)
+    except FileNotFoundError:
+        return False
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        try:
+            _move_file(filepath, processing_path)
+        except FileNotFoundError:
+            return False
+        return True
+    finally:
+        # Fermer le descripteur libère aussi le verrou
+        os.close(fd)
+
 
 def check_altaview_auto_import():
     """
     Vérifie et traite les fichiers CSV dans le dossier d'import automatique.
     Utilise un mécanisme de lock pour éviter les traitements multiples.
     """
-    import shutil
+    logger = current_app.logger
     
     try:
         import_dir = current_app.config.get('ALTAVIEW_AUTO_IMPORT_DIR', '/app/data/altaview_auto_import')
         processed_dir = os.path.join(import_dir, 'processed')
         processing_dir = os.path.join(import_dir, 'processing')
         
-        if not os.path.exists(import_dir):
+        try:
+            dir_mtime = os.stat(import_dir).st_mtime_ns
+        except FileNotFoundError:
             os.makedirs(import_dir, exist_ok=True)
             return
         
+        # Dossier inchangé depuis le dernier parcours (aucun fichier ajouté ni
+        # retiré) : pas de relecture, sauf parcours complet périodique
+        now = time.monotonic()
+        last_scan = _AUTO_IMPORT_SCAN.get(import_dir)
+        if (last_scan and last_scan[0] == dir_mtime
+                and now - last_scan[1] < AUTO_IMPORT_FULL_SCAN_INTERVAL):
+            return
+        _AUTO_IMPORT_SCAN[import_dir] = (dir_mtime, now)
+        
         os.makedirs(processed_dir, exist_ok=True)
         os.makedirs(processing_dir, exist_ok=True)
         
-        for filename in os.listdir(import_dir):
-            if not filename.lower().endswith('.csv'):
-                continue
-            
-            filepath = os.path.join(import_dir, filename)
-            
-            # Vérifier que c'est bien un fichier (pas un dossier)
-            if not os.path.isfile(filepath):
-                continue
-            
+        # scandir fournit le type d'entrée sans stat supplémentaire ; la liste est
+        # figée avant traitement car les fichiers sont déplacés hors du dossier
+        with os.scandir(import_dir) as it:
+            csv_files = [
+                (entry.name, entry.path) for entry in it
+                if entry.name.lower().endswith('.csv') and entry.is_file(follow_symlinks=False)
+            ]
+        
+        for filename, filepath in csv_files:
             # Déplacer vers processing pour "locker" le fichier
             processing_path = os.path.join(processing_dir, filename)
             
             try:
-                # Essayer de déplacer le fichier (atomique)
-                shutil.move(filepath, processing_path)
-            except FileNotFoundError:
-                # Fichier déjà pris par un autre worker
-                current_app.logger.debug(f"Fichier {filename} déjà en cours de traitement")
-                continue
+                # Verrou flock puis déplacement atomique
+                if not _claim_file(filepath, processing_path):
+                    # Fichier déjà pris par un autre worker
+                    logger.debug(f"Fichier {filename} déjà en cours de traitement")
+                    continue
             except Exception as e:
-                current_app.logger.debug(f"Impossible de locker {filename}: {e}")
+                logger.debug(f"Impossible de locker {filename}: {e}")
                 continue
             
-            current_app.logger.info(f"Traitement fichier: {filename}")
+            logger.info(f"Traitement fichier: {filename}")
             
             try:
                 success, stats = import_altaview_file(processing_path, filename, 'auto-import')
@@ -72,40 +205,37 @@ def check_altaview_auto_import():
                 else:
                     new_name = f"ERROR_{ts}_{filename}"
                 
-                shutil.move(processing_path, os.path.join(processed_dir, new_name))
-                current_app.logger.info(f"Fichier traité: {new_name}")
+                _move_file(processing_path, os.path.join(processed_dir, new_name))
+                logger.info(f"Fichier traité: {new_name}")
                 
             except Exception as e:
-                current_app.logger.error(f"Erreur traitement {filename}: {e}")
+                logger.error(f"Erreur traitement {filename}: {e}")
                 # En cas d'erreur, remettre le fichier dans import_dir
                 try:
-                    shutil.move(processing_path, filepath)
+                    _move_file(processing_path, filepath)
                 except:
                     pass
                 
     except Exception as e:
-        current_app.logger.error(f"Erreur auto-import: {e}", exc_info=True)
+        logger.error(f"Erreur auto-import: {e}", exc_info=True)
 
 
 def fetch_imap_attachments(force=False):
     """
     Récupère les pièces jointes des emails IMAP.
+    Appelée par le scheduler à l'intervalle configuré (check_interval),
+    ou manuellement avec force=True.
     """
+    logger = current_app.logger
+    
     try:
         config = get_config('email_import', {})
         
         if not config.get('actif'):
             return
         
-        interval = int(config.get('check_interval', 15))
-        if interval < 1:
-            interval = 1
-        
-        # Ne vérifier qu'à l'intervalle configuré (sauf si forcé)
-        if not force and datetime.now().minute % interval != 0:
-            return
-        
-        current_app.logger.info(f"IMAP: Démarrage cycle ({'FORCE' if force else 'AUTO'} - {interval}min)")
+        # L'intervalle est porté par le trigger de la tâche 'imap_check'
+        logger.info(f"IMAP: Démarrage cycle ({'FORCE' if force else 'AUTO'})")
         
         server = config.get('server')
         user = config.get('user')
@@ -114,73 +244,439 @@ def fetch_imap_attachments(force=False):
         subject_filter = config.get('subject_filter', 'NetBackup')
         
         if not server or not user:
-            current_app.logger.warning("IMAP: Configuration incomplète")
+            logger.warning("IMAP: Configuration incomplète")
             return
         
-        # Connexion IMAP
-        mail = imaplib.IMAP4_SSL(server)
-        mail.login(user, password)
-        
-        # Créer le dossier d'archive si nécessaire
+        with _IMAP_LOCK:
+            # Connexion IMAP (réutilisée entre les cycles)
+            try:
+                mail = _get_imap(server, user, password)
+                status = _imap_status(mail)
+            except (imaplib.IMAP4.abort, OSError):
+                # Session coupée côté serveur : nouvelle connexion
+                _drop_imap((server, user))
+                mail = _get_imap(server, user, password)
+                status = _imap_status(mail)
+            
+            # Plus haut UID déjà traité, valable pour ce compte et cette UIDVALIDITY
+            account = f'{user}@{server}'
+            uidvalidity = status.get(b'UIDVALIDITY')
+            state = get_config(IMAP_STATE_KEY, {})
+            if state.get('account') == account and state.get('uidvalidity') == uidvalidity:
+                last_uid = int(state.get('last_uid', 0))
+            else:
+                last_uid = 0
+            
+            # Aucun message non lu ou aucun nouveau message depuis le dernier cycle :
+            # inutile de sélectionner la boîte et de lancer SEARCH
+            uidnext = status.get(b'UIDNEXT')
+            if status.get(b'UNSEEN') == 0 or (uidnext and uidnext - 1 <= last_uid):
+                return
+            
+            try:
+                mail.select("inbox")
+                new_last_uid = _process_imap_inbox(mail, archive_folder, subject_filter, last_uid)
+            except (imaplib.IMAP4.abort, OSError):
+                _drop_imap((server, user))
+                raise
+            
+            if new_last_uid != last_uid:
+                set_config(
+                    IMAP_STATE_KEY,
+                    {'account': account, 'uidvalidity': uidvalidity, 'last_uid': new_last_uid},
+                    'État import IMAP (dernier UID traité)'
+                )
+            
+    except Exception as e:
+        logger.error(f"IMAP: Erreur: {e}", exc_info=True)
+
+
+def _imap_status(mail):
+    """
+    Compteurs de la boîte de réception via une seule commande STATUS :
+    {b'UNSEEN': n, b'UIDNEXT': n, b'UIDVALIDITY': n} (clés absentes si non renvoyées).
+    """
+    typ, data = mail.status("inbox", "(UNSEEN UIDNEXT UIDVALIDITY)")
+    if typ != 'OK' or not data or not data[0]:
+        return {}
+    return {
+        name: int(value)
+        for name, value in re.findall(rb'(UNSEEN|UIDNEXT|UIDVALIDITY) (\d+)', data[0])
+    }
+
+
+def _decode_attachment_name(filename):
+    """Décode un nom de fichier éventuellement encodé RFC 2047"""
+    header = decode_header(filename)[0]
+    if isinstance(header[0], bytes):
+        return header[0].decode(header[1] or 'utf-8')
+    return header[0]
+
+
+def _imap_response_stream(data):
+    """
+    Reconstitue le flux brut d'une réponse FETCH d'imaplib :
+    les littéraux sont renvoyés séparément sous forme de tuples (en-tête, contenu).
+    """
+    chunks = []
+    for item in data:
+        if isinstance(item, tuple):
+            chunks.append(b' ' + item[0] + b'\r\n' + item[1])
+        elif item:
+            chunks.append(b' ' + item)
+    return b''.join(chunks)
+
+
+def _parse_imap_tokens(raw):
+    """
+    Analyse un flux IMAP (listes parenthésées, chaînes, littéraux {n}, NIL)
+    et retourne la liste des éléments de premier niveau.
+    """
+    stack = [[]]
+    i = 0
+    length = len(raw)
+    while i < length:
+        c = raw[i:i + 1]
+        if c in (b' ', b'\r', b'\n'):
+            i += 1
+        elif c == b'(':
+            stack.append([])
+            i += 1
+        elif c == b')':
+            done = stack.pop()
+            stack[-1].append(done)
+            i += 1
+        elif c == b'"':
+            j = i + 1
+            value = bytearray()
+            while raw[j:j + 1] != b'"':
+                if j >= length:
+                    raise ValueError('Chaîne IMAP non terminée')
+                if raw[j:j + 1] == b'\\':
+                    j += 1
+                value += raw[j:j + 1]
+                j += 1
+            stack[-1].append(bytes(value))
+            i = j + 1
+        elif c == b'{':
+            j = raw.index(b'}', i)
+            size = int(raw[i + 1:j])
+            start = raw.index(b'\n', j) + 1
+            stack[-1].append(raw[start:start + size])
+            i = start + size
+        else:
+            j = i
+            while j < length and raw[j:j + 1] not in (b' ', b'(', b')', b'\r', b'\n'):
+                j += 1
+            atom = raw[i:j]
+            stack[-1].append(None if atom.upper() == b'NIL' else atom)
+            i = j
+    return stack[0]
+
+
+def _imap_fetch_items(data):
+    """Réponse UID FETCH -> {uid: {b'NOM_ITEM': valeur}}"""
+    tokens = _parse_imap_tokens(_imap_response_stream(data))
+    items = {}
+    for seq, attrs in zip(tokens[0::2], tokens[1::2]):
+        values = {key.upper(): value for key, value in zip(attrs[0::2], attrs[1::2])}
+        # Un même message peut apparaître dans plusieurs réponses (ex. FLAGS)
+        items.setdefault(values.get(b'UID', seq), {}).update(values)
+    return items
+
+
+def _imap_param(params, name):
+    """Valeur d'un paramètre (liste clé/valeur) d'une BODYSTRUCTURE"""
+    if isinstance(params, list):
+        for key, value in zip(params[0::2], params[1::2]):
+            if isinstance(key, bytes) and key.upper() == name:
+                return value
+    return None
+
+
+def _find_attachment_parts(structure, prefix=''):
+    """
+    Parcourt une BODYSTRUCTURE et retourne [(section, nom de fichier, encodage)]
+    pour les pièces jointes dont l'extension est importable.
+    """
+    parts = []
+    if structure and isinstance(structure[0], list):
+        # Multipart : sous-parties numérotées 1..n
+        index = 0
+        for child in structure:
+            if not isinstance(child, list):
+                break
+            index += 1
+            parts.extend(_find_attachment_parts(child, f'{prefix}{index}.'))
+        return parts
+    
+    # Partie simple : type, sous-type, paramètres, id, description, encodage, taille, ...
+    section = prefix[:-1] if prefix else '1'
+    filename = None
+    for extension in structure[7:]:
+        if (isinstance(extension, list) and len(extension) == 2
+                and isinstance(extension[0], bytes) and extension[0].lower() in (b'attachment', b'inline')):
+            filename = _imap_param(extension[1], b'FILENAME')
+            break
+    if filename is None:
+        filename = _imap_param(structure[2], b'NAME')
+    
+    if filename:
+        filename = _decode_attachment_name(filename.decode('utf-8', 'replace'))
+        if filename.lower().endswith(IMAP_ATTACHMENT_EXTENSIONS):
+            encoding = (structure[5] or b'7BIT').upper()
+            parts.append((section, filename, encoding))
+    return parts
+
+
+def _write_part(f, payload, encoding):
+    """
+    Écrit le contenu d'une section dans f en le décodant selon son
+    Content-Transfer-Encoding. Le base64 est décodé par blocs de
+    IMAP_DECODE_CHUNK octets, sans copie décodée complète en mémoire.
+    """
+    if encoding == b'BASE64':
+        pending = b''
+        for start in range(0, len(payload), IMAP_DECODE_CHUNK):
+            chunk = pending + b''.join(payload[start:start + IMAP_DECODE_CHUNK].split())
+            usable = len(chunk) - len(chunk) % 4
+            f.write(binascii.a2b_base64(chunk[:usable]))
+            pending = chunk[usable:]
+        if pending:
+            f.write(binascii.a2b_base64(pending + b'=' * (-len(pending) % 4)))
+    elif encoding == b'QUOTED-PRINTABLE':
+        f.write(quopri.decodestring(payload))
+    else:
+        f.write(payload)
+
+
+def _group_by_sections(parts_by_id):
+    """Regroupe les messages ayant les mêmes sections à télécharger"""
+    groups = {}
+    for email_id, parts in parts_by_id.items():
+        sections = tuple(section for section, _, _ in parts)
+        groups.setdefault(sections, []).append(email_id)
+    return groups
+
+
+def _decode_head(head, encoding):
+    """Décode le début d'une section (éventuellement tronquée)"""
+    try:
+        if encoding == b'BASE64':
+            raw = b''.join(head.split())
+            return binascii.a2b_base64(raw[:len(raw) - len(raw) % 4])
+        if encoding == b'QUOTED-PRINTABLE':
+            return quopri.decodestring(head)
+    except binascii.Error:
+        return b''
+    return head
+
+
+def _looks_like_import_file(filename, head):
+    """
+    Vérifie les premiers octets d'une pièce jointe : archive ZIP pour un .xlsx,
+    texte sans caractères de contrôle pour un .csv/.txt.
+    """
+    if not head:
+        return False
+    if filename.lower().endswith('.xlsx'):
+        return head.startswith(b'PK\x03\x04')
+    return not _BINARY_BYTES.intersection(head)
+
+
+def _probe_attachment_parts(mail, parts_by_id):
+    """
+    Récupère les IMAP_PROBE_BYTES premiers octets de chaque pièce jointe et
+    ne conserve que celles dont le contenu correspond à l'extension.
+    """
+    logger = current_app.logger
+    valid = {}
+    for sections, ids in _group_by_sections(parts_by_id).items():
+        query = '(' + ' '.join(f'BODY.PEEK[{section}]<0.{IMAP_PROBE_BYTES}>' for section in sections) + ')'
+        res, data = mail.uid('FETCH', b','.join(ids), query)
+        if res != 'OK':
+            raise imaplib.IMAP4.error(f'FETCH {query}: {res}')
+        
+        for email_id, items in _imap_fetch_items(data).items():
+            kept = []
+            for part in parts_by_id.get(email_id, []):
+                section, filename, encoding = part
+                head = _decode_head(items.get(f'BODY[{section}]<0>'.encode()) or b'', encoding)
+                if _looks_like_import_file(filename, head):
+                    kept.append(part)
+                else:
+                    logger.warning(f"IMAP: Pièce jointe {filename} ignorée (contenu non reconnu)")
+            if kept:
+                valid[email_id] = kept
+    return valid
+
+
+def _fetch_attachment_parts(mail, batch):
+    """
+    Télécharge uniquement les pièces jointes d'un lot de messages :
+    un FETCH BODYSTRUCTURE pour le lot, un FETCH des premiers octets de chaque
+    pièce jointe, puis un FETCH BODY.PEEK[section] par groupe de messages
+    ayant la même structure.
+    Retourne {email_id: [(nom de fichier, contenu encodé, encodage)]}.
+    """
+    res, data = mail.uid('FETCH', b','.join(batch), '(BODYSTRUCTURE)')
+    if res != 'OK':
+        raise imaplib.IMAP4.error(f'FETCH BODYSTRUCTURE: {res}')
+    
+    parts_by_id = {}
+    for email_id, items in _imap_fetch_items(data).items():
+        parts = _find_attachment_parts(items[b'BODYSTRUCTURE'])
+        if parts:
+            parts_by_id[email_id] = parts
+    
+    # Sonde sur les premiers octets : les pièces jointes au contenu non reconnu
+    # ne sont pas téléchargées
+    parts_by_id = _probe_attachment_parts(mail, parts_by_id)
+    
+    attachments = {}
+    for sections, ids in _group_by_sections(parts_by_id).items():
+        query = '(' + ' '.join(f'BODY.PEEK[{section}]' for section in sections) + ')'
+        res, data = mail.uid('FETCH', b','.join(ids), query)
+        if res != 'OK':
+            raise imaplib.IMAP4.error(f'FETCH {query}: {res}')
+        
+        for email_id, items in _imap_fetch_items(data).items():
+            attachments[email_id] = [
+                (filename, items.get(f'BODY[{section}]'.encode()) or b'', encoding)
+                for section, filename, encoding in parts_by_id.get(email_id, [])
+            ]
+    return attachments
+
+
+def _fetch_full_attachments(mail, batch):
+    """
+    Repli : télécharge les messages complets du lot et extrait les pièces jointes.
+    Retourne {email_id: [(nom de fichier, contenu encodé, encodage)]}.
+    """
+    res, data = mail.uid('FETCH', b','.join(batch), '(BODY.PEEK[])')
+    if res != 'OK':
+        raise imaplib.IMAP4.error(f'FETCH BODY.PEEK[]: {res}')
+    
+    attachments = {}
+    for item in data:
+        if not isinstance(item, tuple):
+            continue
+        match = re.search(rb'UID (\d+)', item[0])
+        if not match:
+            continue
+        email_id = match.group(1)
+        msg = email.message_from_bytes(item[1])
+        files = []
+        if msg.is_multipart():
+            for part in msg.walk():
+                filename = part.get_filename()
+                if filename:
+                    filename = _decode_attachment_name(filename)
+                    if filename.lower().endswith(IMAP_ATTACHMENT_EXTENSIONS):
+                        if part.get('Content-Transfer-Encoding', '').strip().lower() == 'base64':
+                            # Décodage différé à l'écriture
+                            payload, encoding = part.get_payload().encode('ascii'), b'BASE64'
+                        else:
+                            payload, encoding = part.get_payload(decode=True) or b'', b'BINARY'
+                        if _looks_like_import_file(filename, _decode_head(payload[:IMAP_PROBE_BYTES], encoding)):
+                            files.append((filename, payload, encoding))
+                        else:
+                            current_app.logger.warning(f"IMAP: Pièce jointe {filename} ignorée (contenu non reconnu)")
+        attachments[email_id] = files
+    return attachments
+
+
+def _process_imap_inbox(mail, archive_folder, subject_filter, last_uid=0):
+    """
+    Traite les emails non lus de la boîte sélectionnée dont l'UID est
+    supérieur à last_uid. Retourne le nouveau plus haut UID traité.
+    """
+    logger = current_app.logger
+    
+    # Créer le dossier d'archive si nécessaire
+    try:
+        mail.create(archive_folder)
+    except:
+        pass
+    
+    # Rechercher les emails non lus avec le filtre, au-delà du dernier UID traité
+    # (UID n:* renvoie toujours le dernier message, d'où le filtre sur l'UID)
+    status, msgs = mail.uid('SEARCH', None, f'(UID {last_uid + 1}:* UNSEEN SUBJECT "{subject_filter}")')
+    email_ids = [uid for uid in (msgs[0].split() if msgs and msgs[0] else []) if int(uid) > last_uid]
+    if not email_ids:
+        return last_uid
+    
+    import_dir = current_app.config.get('ALTAVIEW_AUTO_IMPORT_DIR', '/app/data/altaview_auto_import')
+    processed_ids = []
+    skipped_ids = []
+    processed_count = 0
+    first_failed_uid = None
+    
+    # Téléchargement par lots, limité aux pièces jointes (BODYSTRUCTURE puis sections).
+    # BODY.PEEK ne marque pas les messages comme lus avant que l'archivage ait réussi.
+    for start in range(0, len(email_ids), IMAP_FETCH_BATCH):
+        batch = email_ids[start:start + IMAP_FETCH_BATCH]
         try:
-            mail.create(archive_folder)
-        except:
-            pass
-        
-        mail.select("inbox")
-        
-        # Rechercher les emails non lus avec le filtre
-        status, msgs = mail.search(None, f'(UNSEEN SUBJECT "{subject_filter}")')
-        
-        import_dir = current_app.config.get('ALTAVIEW_AUTO_IMPORT_DIR', '/app/data/altaview_auto_import')
-        processed_count = 0
+            attachments = _fetch_attachment_parts(mail, batch)
+        except (imaplib.IMAP4.abort, OSError):
+            raise
+        except Exception as e:
+            logger.warning(f"IMAP: BODYSTRUCTURE inexploitable ({e}), téléchargement complet")
+            try:
+                attachments = _fetch_full_attachments(mail, batch)
+            except (imaplib.IMAP4.abort, OSError):
+                raise
+            except Exception as e:
+                logger.error(f"IMAP: Échec FETCH du lot {batch[0]}..{batch[-1]}: {e}")
+                if first_failed_uid is None:
+                    first_failed_uid = int(batch[0])
+                continue
         
-        for email_id in msgs[0].split():
+        for email_id in batch:
             processed = False
             try:
-                res, data = mail.fetch(email_id, "(RFC822)")
-                msg = email.message_from_bytes(data[0][1])
-                
-                if msg.is_multipart():
-                    for part in msg.walk():
-                        filename = part.get_filename()
-                        if filename:
-                            # Décoder le nom du fichier
-                            header = decode_header(filename)[0]
-                            if isinstance(header[0], bytes):
-                                filename = header[0].decode(header[1] or 'utf-8')
-                            
-                            # Vérifier l'extension
-                            if filename.lower().endswith(('.csv', '.txt', '.xlsx')):
-                                new_name = f"altaview_imap_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-                                filepath = os.path.join(import_dir, new_name)
-                                
-                                with open(filepath, 'wb') as f:
-                                    f.write(part.get_payload(decode=True))
-                                
-                                current_app.logger.info(f"IMAP: Fichier sauvegardé: {new_name}")
-                                processed = True
-                                processed_count += 1
-                
-                # Archiver ou supprimer l'email traité
-                if processed:
-                    result = mail.copy(email_id, archive_folder)
-                    if result[0] == 'OK':
-                        mail.store(email_id, '+FLAGS', '\\Deleted')
-                    else:
-                        mail.store(email_id, '+FLAGS', '\\Deleted')
-                        
+                files = attachments.get(email_id, [])
+                ts = datetime.now().strftime('%Y%m%d_%H%M%S') if files else None
+                for filename, payload, encoding in files:
+                    new_name = f"altaview_imap_{ts}_{processed_count}.csv"
+                    filepath = os.path.join(import_dir, new_name)
+                    
+                    with open(filepath, 'wb') as f:
+                        _write_part(f, payload, encoding)
+                    
+                    logger.info(f"IMAP: Fichier sauvegardé: {new_name}")
+                    processed = True
+                    processed_count += 1
+                    
             except Exception as e:
-                current_app.logger.error(f"IMAP: Erreur traitement email {email_id}: {e}")
-        
-        mail.expunge()
-        mail.logout()
-        
-        if processed_count > 0:
-            current_app.logger.info(f"IMAP: {processed_count} fichier(s) récupéré(s)")
+                logger.error(f"IMAP: Erreur traitement email {email_id}: {e}")
             
-    except Exception as e:
-        current_app.logger.error(f"IMAP: Erreur: {e}", exc_info=True)
+            (processed_ids if processed else skipped_ids).append(email_id)
+    
+    # Archiver puis supprimer les emails traités (une commande par opération)
+    if processed_ids:
+        seq = b','.join(processed_ids)
+        result = mail.uid('COPY', seq, archive_folder)
+        if result[0] != 'OK':
+            logger.warning(f"IMAP: Copie vers {archive_folder} échouée")
+        mail.uid('STORE', seq, '+FLAGS', '\\Deleted')
+    
+    # Les autres emails sont marqués comme lus (comme l'ancien FETCH RFC822)
+    if skipped_ids:
+        mail.uid('STORE', b','.join(skipped_ids), '+FLAGS', '\\Seen')
+    
+    mail.expunge()
+    
+    if processed_count > 0:
+        logger.info(f"IMAP: {processed_count} fichier(s) récupéré(s)")
+        # Import immédiat des fichiers déposés plutôt qu'au prochain passage
+        from app.services.scheduler_service import trigger_auto_import
+        trigger_auto_import()
+    
+    # Un lot en échec sera retenté au prochain cycle
+    if first_failed_uid is not None:
+        return max(last_uid, first_failed_uid - 1)
+    return max(int(uid) for uid in email_ids)
 
 
 def fetch_altaview_api():
@@ -212,18 +708,22 @@ def fetch_altaview_api():
         
         # Appel API avec timeout
         try:
-            response = requests.get(api_url, headers=headers, timeout=60)
+            response = _API_SESSION.get(api_url, headers=headers, timeout=60)
             response.raise_for_status()  # Lève une exception si erreur HTTP
         except requests.exceptions.RequestException as e:
             current_app.logger.error(f"API: Erreur connexion - {e}")
             return False
         
+        # Contenu brut : pas de décodage texte par requests (détection de charset
+        # coûteuse sur un gros export), l'import détecte lui-même l'encodage
+        content = response.content
+        
         # Vérifier que nous avons bien reçu du contenu
-        if not response.text or len(response.text) < 10:
+        if not content or len(content) < 10:
             current_app.logger.warning("API: Réponse vide ou invalide")
             return False
         
-        current_app.logger.info(f"API: Fichier récupéré ({len(response.text)} octets)")
+        current_app.logger.info(f"API: Fichier récupéré ({len(content)} octets)")
         
         # Sauvegarder le fichier dans le répertoire d'import
         import_dir = current_app.config.get('ALTAVIEW_AUTO_IMPORT_DIR', '/app/data/altaview_auto_import')
@@ -242,8 +742,8 @@ def fetch_altaview_api():
         processing_path = os.path.join(processing_dir, filename)
         
         # Écrire le contenu dans le fichier
-        with open(processing_path, 'w', encoding='utf-8') as f:
-            f.write(response.text)
+        with open(processing_path, 'wb') as f:
+            f.write(content)
         
         current_app.logger.info(f"API: Fichier sauvegardé: {filename}")
         
@@ -257,12 +757,11 @@ def fetch_altaview_api():
             processed_dir = os.path.join(import_dir, 'processed')
             os.makedirs(processed_dir, exist_ok=True)
             
-            import shutil
             processed_path = os.path.join(processed_dir, filename)
             
             # Vérifier que le fichier existe avant de le déplacer
             if os.path.exists(processing_path):
-                shutil.move(processing_path, processed_path)
+                _move_file(processing_path, processed_path)
             else:
                 current_app.logger.warning(f"API: Fichier {filename} introuvable (déjà traité?)")
             
@@ -275,10 +774,9 @@ def fetch_altaview_api():
             error_path = os.path.join(import_dir, 'processed', error_filename)
             os.makedirs(os.path.dirname(error_path), exist_ok=True)
             
-            import shutil
             # Vérifier que le fichier existe avant de le déplacer
             if os.path.exists(processing_path):
-                shutil.move(processing_path, error_path)
+                _move_file(processing_path, error_path)
             else:
                 current_app.logger.warning(f"API: Fichier {filename} introuvable")
             
@@ -9,6 +9,7 @@ import re
 import time
 from datetime import datetime
 from flask import current_app
+from sqlalchemy import insert
 
 from app import db, cache
 from app.models.cmdb import ReferentielCMDB, CMDBHistory
@@ -88,6 +89,27 @@ def detect_encoding(raw_content):
     return 'utf-8'
 
 
+# Formats de date reconnus (hors ISO 8601, traité par datetime.fromisoformat)
+DATE_FORMATS = (
+    '%Y-%m-%d %H:%M:%S',
+    '%d/%m/%Y %H:%M:%S',
+    '%m/%d/%Y %H:%M:%S',
+    '%Y/%m/%d %H:%M:%S',
+    '%b %d, %Y %I:%M:%S %p',
+    '%d-%m-%Y %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d %H:%M',
+    '%d/%m/%Y %H:%M',
+    '%Y-%m-%d',
+    '%d/%m/%Y',
+)
+# Format américain jamais essayé en premier : il prendrait le pas sur %d/%m/%Y
+# pour les dates valides dans les deux formats
+_AMBIGUOUS_DATE_FORMATS = frozenset({'%m/%d/%Y %H:%M:%S'})
+# Dernier format reconnu : les lignes d'un même fichier partagent le même format
+_last_date_format = [DATE_FORMATS[0]]
+
+
 def parse_date(date_str):
     """
     Parse une date avec support de multiples formats.
@@ -97,25 +119,25 @@ def parse_date(date_str):
     
     date_str = date_str.strip().strip('"').strip("'")
     
-    formats = [
-        '%Y-%m-%d %H:%M:%S',
-        '%d/%m/%Y %H:%M:%S',
-        '%m/%d/%Y %H:%M:%S',
-        '%Y/%m/%d %H:%M:%S',
-        '%b %d, %Y %I:%M:%S %p',
-        '%d-%m-%Y %H:%M:%S',
-        '%Y-%m-%dT%H:%M:%S',
-        '%Y-%m-%d %H:%M',
-        '%d/%m/%Y %H:%M',
-        '%Y-%m-%d',
-        '%d/%m/%Y',
-    ]
+    # Chemin rapide ISO 8601 (AAAA-MM-JJ[ HH:MM[:SS]]), sans fuseau horaire
+    if date_str[4:5] == '-':
+        try:
+            parsed = datetime.fromisoformat(date_str)
+            if parsed.tzinfo is None:
+                return parsed
+        except ValueError:
+            pass
     
-    for fmt in formats:
+    # Format de la ligne précédente en premier : évite une exception par format essayé
+    hint = _last_date_format[0]
+    for fmt in (hint,) + DATE_FORMATS:
         try:
-            return datetime.strptime(date_str, fmt)
+            parsed = datetime.strptime(date_str, fmt)
         except ValueError:
             continue
+        if fmt not in _AMBIGUOUS_DATE_FORMATS:
+            _last_date_format[0] = fmt
+        return parsed
     
     # Essayer le format timestamp Unix
     try:
@@ -129,6 +151,17 @@ def parse_date(date_str):
     return None
 
 
+# Taille : nombre + unité optionnelle, et facteur de conversion vers le GB
+_SIZE_RE = re.compile(r'([\d.]+)\s*(KB|MB|GB|TB|K|M|G|T|B)?', re.IGNORECASE)
+_SIZE_UNIT_TO_GB = {
+    'KB': 1 / (1024 * 1024), 'K': 1 / (1024 * 1024),
+    'MB': 1 / 1024, 'M': 1 / 1024,
+    'GB': 1, 'G': 1,
+    'TB': 1024, 'T': 1024,
+    'B': 1 / (1024 * 1024 * 1024),
+}
+
+
 def parse_size(size_str, is_already_gb=False):
     """
     Parse une taille avec détection de l'unité.
@@ -156,7 +189,7 @@ def parse_size(size_str, is_already_gb=False):
             size_str = size_str.replace(',', '.')
     
     # Pattern: nombre + unité optionnelle
-    match = re.match(r'([\d.]+)\s*(KB|MB|GB|TB|K|M|G|T|B)?', size_str, re.IGNORECASE)
+    match = _SIZE_RE.match(size_str)
     
     if not match:
         try:
@@ -171,20 +204,78 @@ def parse_size(size_str, is_already_gb=False):
     if is_already_gb and not unit:
         return value
     
-    # Conversion en GB selon l'unité
-    if unit in ['KB', 'K']:
-        return value / (1024 * 1024)
-    elif unit in ['MB', 'M']:
-        return value / 1024
-    elif unit in ['GB', 'G']:
-        return value
-    elif unit in ['TB', 'T']:
-        return value * 1024
-    elif unit == 'B':
-        return value / (1024 * 1024 * 1024)
-    else:
-        # Pas d'unité détectée - retourner tel quel (on suppose GB par défaut)
-        return value
+    # Conversion en GB selon l'unité (pas d'unité détectée : on suppose GB par défaut)
+    return value * _SIZE_UNIT_TO_GB.get(unit, 1)
+
+
+# Colonnes candidates d'un export Altaview, par ordre de priorité
+ALTAVIEW_COLUMNS = {
+    'hostname': ('hostname', 'client', 'asset_displayable_name', 'Client', 'clientName'),
+    'backup_time': ('backup_time', 'date', 'start_date', 'Start Date', 'startDate'),
+    'taille': ('taille_gb', 'size_gb', 'size', 'Size', 'sizeGB'),
+    'status': ('status', 'Status', 'statusCode'),
+    'job_id': ('job_id', 'Job ID', 'jobId', 'last_job_id'),
+    'policy_name': ('policy_name', 'Policy', 'policyName'),
+    'schedule_name': ('schedule_name', 'Schedule', 'scheduleName'),
+    'duree': ('duree_minutes', 'duration', 'Duration', 'max_duration'),
+}
+
+
+def _first_value(row, keys):
+    """Première valeur non vide d'une ligne parmi les colonnes keys"""
+    for key in keys:
+        value = row[key]
+        if value:
+            return value
+    return ''
+
+
+def _first_stripped(row, keys):
+    """Première valeur non vide (après strip) d'une ligne parmi les colonnes keys"""
+    for key in keys:
+        value = row[key]
+        if value:
+            value = value.strip()
+            if value:
+                return value
+    return ''
+
+
+# Taille des lots de valeurs passées dans les clauses IN
+PREFETCH_CHUNK_SIZE = 500
+
+
+def _prefetch_existing_jobs(parsed_rows):
+    """
+    Charge en quelques requêtes les jobs déjà présents en base pour les lignes
+    d'un import : par job_id, et par (backup_time, hostname, policy) sur la
+    plage de dates du fichier.
+    Retourne (jobs par job_id, jobs par clé).
+    """
+    by_job_id = {}
+    by_key = {}
+    if not parsed_rows:
+        return by_job_id, by_key
+    
+    job_ids = sorted({row[2] for row in parsed_rows if row[2]})
+    for start in range(0, len(job_ids), PREFETCH_CHUNK_SIZE):
+        chunk = job_ids[start:start + PREFETCH_CHUNK_SIZE]
+        for job in JobAltaview.query.filter(JobAltaview.job_id.in_(chunk)).order_by(JobAltaview.id):
+            by_job_id.setdefault(job.job_id, job)
+    
+    hostnames = sorted({row[0] for row in parsed_rows})
+    min_time = min(row[1] for row in parsed_rows)
+    max_time = max(row[1] for row in parsed_rows)
+    for start in range(0, len(hostnames), PREFETCH_CHUNK_SIZE):
+        chunk = hostnames[start:start + PREFETCH_CHUNK_SIZE]
+        query = JobAltaview.query.filter(
+            JobAltaview.hostname.in_(chunk),
+            JobAltaview.backup_time.between(min_time, max_time)
+        ).order_by(JobAltaview.id)
+        for job in query:
+            by_key.setdefault((job.backup_time, job.hostname, job.policy_name), job)
+    
+    return by_job_id, by_key
 
 
 def import_altaview_file(filepath, filename, user='auto-import'):
@@ -224,90 +315,55 @@ def import_altaview_file(filepath, filename, user='auto-import'):
             'nb_errors': 0
         }
         
+        # Lignes analysées : (hostname normalisé, backup_time, job_id, policy, schedule, status, taille, durée)
+        parsed_rows = []
+        
+        # Nouveaux jobs insérés en un seul INSERT multi-lignes en fin d'import,
+        # indexés pour détecter les doublons à l'intérieur du fichier
+        new_jobs = []
+        new_by_job_id = {}
+        new_by_key = {}
+        
+        # Colonnes candidates réellement présentes dans l'en-tête, résolues une fois
+        fieldnames = set(reader.fieldnames or ())
+        hostname_cols, date_cols, size_cols, status_cols, job_id_cols, policy_cols, schedule_cols, duration_cols = (
+            tuple(key for key in ALTAVIEW_COLUMNS[field] if key in fieldnames)
+            for field in ('hostname', 'backup_time', 'taille', 'status', 'job_id', 'policy_name', 'schedule_name', 'duree')
+        )
+        
         for row in reader:
             try:
                 # Extraction du hostname
-                hostname = (
-                    row.get('hostname', '').strip() or
-                    row.get('client', '').strip() or
-                    row.get('asset_displayable_name', '').strip() or
-                    row.get('Client', '').strip() or
-                    row.get('clientName', '').strip()
-                )
+                hostname = _first_stripped(row, hostname_cols)
                 
                 if not hostname:
                     continue
                 
                 # Extraction de la date
-                backup_time_str = (
-                    row.get('backup_time', '').strip() or
-                    row.get('date', '').strip() or
-                    row.get('start_date', '').strip() or
-                    row.get('Start Date', '').strip() or
-                    row.get('startDate', '').strip()
-                )
-                
-                backup_time = parse_date(backup_time_str)
+                backup_time = parse_date(_first_stripped(row, date_cols))
                 if not backup_time:
                     stats['nb_errors'] += 1
                     continue
                 
-                # Extraction de la taille
-                taille_str = (
-                    row.get('taille_gb', '') or
-                    row.get('size_gb', '') or
-                    row.get('size', '') or
-                    row.get('Size', '') or
-                    row.get('sizeGB', '') or
-                    '0'
-                )
-                # Si la colonne contient "gb" dans le nom, la valeur est déjà en GB
-                is_gb = any(k.lower() in ['taille_gb', 'size_gb', 'sizegb'] for k in row.keys() if row.get(k) == taille_str)
-                taille_gb = parse_size(taille_str, is_already_gb=True)
+                # Extraction de la taille (valeurs de l'export déjà en GB)
+                taille_gb = parse_size(_first_value(row, size_cols) or '0', is_already_gb=True)
                 
                 # Extraction du status
-                status = (
-                    row.get('status', '') or
-                    row.get('Status', '') or
-                    row.get('statusCode', '') or
-                    'UNKNOWN'
-                ).strip()
+                status = (_first_value(row, status_cols) or 'UNKNOWN').strip()
                 
                 # Extraction du job_id
-                job_id = (
-                    row.get('job_id', '') or
-                    row.get('Job ID', '') or
-                    row.get('jobId', '') or
-                    row.get('last_job_id', '') or
-                    ''
-                ).strip()
+                job_id = _first_value(row, job_id_cols).strip()
                 # Nettoyer les séparateurs de milliers dans le job_id
                 if ',' in job_id:
                     job_id = job_id.replace(',', '')
                 
                 # Extraction de la policy
-                policy_name = (
-                    row.get('policy_name', '') or
-                    row.get('Policy', '') or
-                    row.get('policyName', '') or
-                    ''
-                ).strip()
+                policy_name = _first_value(row, policy_cols).strip()
                 
-                schedule_name = (
-                    row.get('schedule_name', '') or
-                    row.get('Schedule', '') or
-                    row.get('scheduleName', '') or
-                    ''
-                ).strip()
+                schedule_name = _first_value(row, schedule_cols).strip()
                 
                 # Durée (peut être en minutes ou au format HH:MM:SS)
-                duree_str = (
-                    row.get('duree_minutes', '') or
-                    row.get('duration', '') or
-                    row.get('Duration', '') or
-                    row.get('max_duration', '') or
-                    '0'
-                )
+                duree_str = _first_value(row, duration_cols) or '0'
                 try:
                     duree_str = str(duree_str).strip().strip('"').strip("'")
                     # Format HH:MM:SS
@@ -326,53 +382,79 @@ def import_altaview_file(filepath, filename, user='auto-import'):
                 except:
                     duree = 0
                 
-                # Vérification des doublons
-                normalized_host = normalize_hostname(hostname)
-                
-                # Vérifier si un job identique existe déjà
-                existing_job = None
-                
-                # Par job_id si disponible (identifiant unique)
-                if job_id:
-                    existing_job = JobAltaview.query.filter_by(job_id=job_id).first()
-                
-                # Si pas trouvé par job_id, chercher par combinaison hostname + backup_time
-                if not existing_job:
-                    existing_job = JobAltaview.query.filter_by(
-                        backup_time=backup_time,
-                        hostname=normalized_host,
-                        policy_name=policy_name
-                    ).first()
-                
-                if existing_job:
-                    # MISE À JOUR avec les nouvelles valeurs (garder les données les plus récentes)
-                    existing_job.status = status
-                    existing_job.taille_gb = round(taille_gb, 6)
-                    existing_job.duree_minutes = duree
-                    existing_job.schedule_name = schedule_name
-                    if job_id and not existing_job.job_id:
-                        existing_job.job_id = job_id
-                    existing_job.date_import = datetime.now()
-                    stats['nb_mis_a_jour'] += 1
-                else:
-                    # Créer le job
-                    job = JobAltaview(
-                        hostname=normalized_host,
-                        backup_time=backup_time,
-                        job_id=job_id,
-                        policy_name=policy_name,
-                        schedule_name=schedule_name,
-                        status=status,
-                        taille_gb=round(taille_gb, 6),
-                        duree_minutes=duree
-                    )
-                    db.session.add(job)
-                    stats['nb_ajoutes'] += 1
+                parsed_rows.append((
+                    normalize_hostname(hostname), backup_time, job_id, policy_name,
+                    schedule_name, status, round(taille_gb, 6), duree
+                ))
                 
             except Exception as e:
                 current_app.logger.warning(f"Erreur ligne: {e}")
                 stats['nb_errors'] += 1
         
+        # Jobs déjà en base chargés par lots (au lieu de deux SELECT par ligne)
+        existing_by_job_id, existing_by_key = _prefetch_existing_jobs(parsed_rows)
+        
+        for normalized_host, backup_time, job_id, policy_name, schedule_name, status, taille_gb, duree in parsed_rows:
+            # Vérifier si un job identique existe déjà (dans ce fichier ou en base)
+            existing_job = None
+            job_key = (backup_time, normalized_host, policy_name)
+            pending_job = new_by_job_id.get(job_id) if job_id else None
+            if pending_job is None:
+                pending_job = new_by_key.get(job_key)
+            
+            # Par job_id si disponible (identifiant unique)
+            if pending_job is None and job_id:
+                existing_job = existing_by_job_id.get(job_id)
+            
+            # Si pas trouvé par job_id, chercher par combinaison hostname + backup_time
+            if pending_job is None and not existing_job:
+                existing_job = existing_by_key.get(job_key)
+            
+            if pending_job is not None:
+                # Doublon dans le fichier : même mise à jour que pour un job existant
+                pending_job.update(
+                    status=status,
+                    taille_gb=taille_gb,
+                    duree_minutes=duree,
+                    schedule_name=schedule_name,
+                    date_import=datetime.now()
+                )
+                if job_id and not pending_job['job_id']:
+                    pending_job['job_id'] = job_id
+                    new_by_job_id[job_id] = pending_job
+                stats['nb_mis_a_jour'] += 1
+            elif existing_job:
+                # MISE À JOUR avec les nouvelles valeurs (garder les données les plus récentes)
+                existing_job.status = status
+                existing_job.taille_gb = taille_gb
+                existing_job.duree_minutes = duree
+                existing_job.schedule_name = schedule_name
+                if job_id and not existing_job.job_id:
+                    existing_job.job_id = job_id
+                    existing_by_job_id.setdefault(job_id, existing_job)
+                existing_job.date_import = datetime.now()
+                stats['nb_mis_a_jour'] += 1
+            else:
+                # Créer le job
+                job = {
+                    'hostname': normalized_host,
+                    'backup_time': backup_time,
+                    'job_id': job_id,
+                    'policy_name': policy_name,
+                    'schedule_name': schedule_name,
+                    'status': status,
+                    'taille_gb': taille_gb,
+                    'duree_minutes': duree,
+                    'date_import': datetime.now()
+                }
+                new_jobs.append(job)
+                if job_id:
+                    new_by_job_id[job_id] = job
+                new_by_key[job_key] = job
+                stats['nb_ajoutes'] += 1
+        
+        if new_jobs:
+            db.session.execute(insert(JobAltaview), new_jobs)
         db.session.commit()
         
         # Invalider le cache
@@ -446,7 +528,7 @@ def import_cmdb_file(filepath, filename, mode='merge', user='admin'):
         stats = {'added': 0, 'updated': 0, 'skipped': 0}
         
         if mode == 'replace':
-            ReferentielCMDB.query.delete()
+            ReferentielCMDB.query.delete(synchronize_session=False)
             db.session.commit()
         
         for row in reader:
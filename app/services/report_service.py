@@ -7,24 +7,75 @@ Version améliorée avec :
 - En-têtes répétés sur chaque page PDF
 - Style harmonisé entre Rapport et Archivage
 """
-import io
+import tempfile
+from types import MappingProxyType
 from datetime import datetime
+from zipfile import ZipFile, ZIP_DEFLATED
 from collections import defaultdict
-from flask import current_app
+from functools import lru_cache
+from flask import current_app, g
+# openpyxl bascule automatiquement sur lxml (requirements.txt) pour écrire les feuilles en flux
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
+from openpyxl.worksheet.dimensions import ColumnDimension
+from openpyxl.writer.excel import ExcelWriter
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import cm
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
 
-from app.services.compliance_service import get_jobs_map, normalize_hostname
+from app.services.compliance_service import get_jobs_map, normalize_hostnames
+
+
+def _cached_jobs_map():
+    """
+    get_jobs_map() mémorisé dans le contexte courant (g) : un envoi par email
+    ou une requête qui génère PDF et Excel ne refait la requête qu'une fois.
+    """
+    if '_jobs_map' not in g:
+        g._jobs_map = get_jobs_map()
+    return g._jobs_map
+
+
+def zip_host_jobs(hosts, jobs_map):
+    """
+    Associe chaque hostname à ses jobs en une passe : (host, jobs).
+    Les noms sont normalisés une seule fois, puis réutilisés par toutes les sections.
+    """
+    return [
+        (host, jobs_map.get(norm_name, ()))
+        for host, norm_name in zip(hosts, normalize_hostnames(hosts))
+    ]
+
+
+# Niveau zlib du .xlsx : 1 garde l'essentiel du gain de taille pour une fraction du temps CPU
+EXCEL_COMPRESS_LEVEL = 1
+
+# Au-delà de cette taille, le fichier du rapport est écrit sur disque plutôt qu'en mémoire
+REPORT_SPOOL_MAX_SIZE = 4 * 1024 * 1024
+
+
+def new_report_buffer():
+    """
+    Tampon de sortie d'un rapport : en mémoire pour les petits fichiers,
+    basculé sur un fichier temporaire au-delà de REPORT_SPOOL_MAX_SIZE.
+    """
+    return tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_MAX_SIZE)
 
 
 # =============================================================================
 # STYLES COMMUNS
 # =============================================================================
 
+@lru_cache(maxsize=1)
 def get_excel_styles():
-    """Retourne les styles Excel réutilisables."""
-    import openpyxl
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-    
-    return {
+    """
+    Retourne les styles Excel réutilisables.
+    Construits une seule fois par processus, exposés en lecture seule.
+    """
+    return MappingProxyType({
         'header_font': Font(bold=True, color="FFFFFF", size=11),
         'header_fill_ok': PatternFill("solid", fgColor="198754"),
         'header_fill_ko': PatternFill("solid", fgColor="dc3545"),
@@ -46,7 +97,43 @@ def get_excel_styles():
         'subtitle_font': Font(size=11, italic=True, color="666666"),
         'stat_font': Font(bold=True, size=11),
         'stat_value_font': Font(bold=True, size=12, color="FFFFFF"),
-    }
+    })
+
+
+# Styles nommés des tableaux : nom -> (police, fond, alignement)
+EXCEL_NAMED_STYLES = {
+    'header_ok': ('header_font', 'header_fill_ok', 'center_align'),
+    'header_ko': ('header_font', 'header_fill_ko', 'center_align'),
+    'header_out': ('header_font', 'header_fill_out', 'center_align'),
+    'row_ok': (None, 'row_fill_ok', None),
+    'row_ko': (None, 'row_fill_ko', None),
+    'row_out': (None, 'row_fill_out', None),
+}
+
+
+def register_excel_named_styles(wb, styles):
+    """
+    Enregistre les styles nommés des tableaux dans le classeur.
+    Chaque cellule reçoit ensuite un seul style (cell.style = 'row_ok')
+    au lieu de trois affectations fond/bordure/police.
+    """
+    for name, (font, fill, alignment) in EXCEL_NAMED_STYLES.items():
+        named = NamedStyle(name=name, fill=styles[fill], border=styles['thin_border'])
+        if font:
+            named.font = styles[font]
+        if alignment:
+            named.alignment = styles[alignment]
+        wb.add_named_style(named)
+
+
+def save_workbook(wb, buffer):
+    """
+    Équivalent de wb.save(buffer) avec un niveau de compression réduit
+    (openpyxl utilise le niveau zlib par défaut, sans option pour le changer).
+    """
+    archive = ZipFile(buffer, 'w', ZIP_DEFLATED, allowZip64=True, compresslevel=EXCEL_COMPRESS_LEVEL)
+    wb.properties.modified = datetime.utcnow()
+    ExcelWriter(wb, archive).save()
 
 
 def setup_excel_sheet_filters(ws, last_col, last_row):
@@ -57,39 +144,260 @@ def setup_excel_sheet_filters(ws, last_col, last_row):
 
 
 def adjust_column_widths(ws, widths_dict):
-    """Ajuste les largeurs de colonnes."""
+    """
+    Ajuste les largeurs de colonnes (avant le premier append en mode write-only).
+    Chaque ColumnDimension est créée directement avec sa largeur.
+    """
     for col_letter, width in widths_dict.items():
-        ws.column_dimensions[col_letter].width = width
+        ws.column_dimensions[col_letter] = ColumnDimension(ws, index=col_letter, width=width)
+
+
+def styled_cell(ws, value, font=None, fill=None, alignment=None, border=None):
+    """Crée une cellule write-only avec les styles partagés."""
+    cell = WriteOnlyCell(ws, value=value)
+    if font is not None:
+        cell.font = font
+    if fill is not None:
+        cell.fill = fill
+    if alignment is not None:
+        cell.alignment = alignment
+    if border is not None:
+        cell.border = border
+    return cell
+
+
+def named_cell(ws, value, style_name):
+    """Crée une cellule write-only portant un style nommé du classeur."""
+    cell = WriteOnlyCell(ws, value=value)
+    cell.style = style_name
+    return cell
+
+
+def append_header_row(ws, headers, style_name):
+    """Ajoute la ligne d'en-têtes d'un tableau (style nommé header_*)."""
+    ws.append([named_cell(ws, h, style_name) for h in headers])
+
+
+def append_styled_row(ws, values, style_name):
+    """Ajoute une ligne de données (style nommé row_* sur toutes les colonnes)."""
+    ws.append([named_cell(ws, v, style_name) for v in values])
+
+
+def append_summary_sheet(ws, title, subtitle, stats, widths, styles):
+    """Remplit la feuille Résumé : titre, sous-titre et statistiques colorées."""
+    adjust_column_widths(ws, widths)
+    
+    ws.append([styled_cell(ws, title, font=styles['title_font'])])
+    ws.merged_cells.add('A1:D1')
+    ws.append([styled_cell(ws, subtitle, font=styles['subtitle_font'])])
+    ws.merged_cells.add('A2:D2')
+    ws.append([])
+    
+    for label, value, fill in stats:
+        ws.append([
+            styled_cell(ws, label, font=styles['stat_font'], border=styles['thin_border']),
+            styled_cell(ws, value, font=styles['stat_value_font'], fill=fill,
+                        alignment=styles['center_align'], border=styles['thin_border'])
+        ])
+
+
+# =============================================================================
+# STYLES PDF
+# =============================================================================
+
+PDF_COLORS = {
+    'ok': colors.HexColor('#198754'),
+    'ko': colors.HexColor('#dc3545'),
+    'out': colors.HexColor('#FF8C00'),
+    'blue': colors.HexColor('#4472C4'),
+    'light_ok': colors.HexColor('#E2EFDA'),
+    'light_ko': colors.HexColor('#FCE4D6'),
+    'light_out': colors.HexColor('#FFF3CD'),
+    'title': colors.HexColor('#1F4E78'),
+    'stripe': colors.HexColor('#f8f9fa'),
+    'meta': colors.HexColor('#666666'),
+}
+
+
+@lru_cache(maxsize=1)
+def get_pdf_styles():
+    """
+    Retourne les styles de paragraphes PDF réutilisables.
+    Construits une seule fois par processus, exposés en lecture seule.
+    """
+    sample = getSampleStyleSheet()
+    pdf_styles = {
+        'normal': sample['Normal'],
+        'title': ParagraphStyle(
+            'CustomTitle',
+            parent=sample['Heading1'],
+            fontSize=20,
+            spaceAfter=20,
+            textColor=PDF_COLORS['title']
+        ),
+        'archive_title': ParagraphStyle(
+            'CustomTitle',
+            parent=sample['Heading1'],
+            fontSize=18,
+            spaceAfter=15,
+            textColor=PDF_COLORS['title']
+        ),
+        'section': ParagraphStyle(
+            'SectionTitle',
+            parent=sample['Heading2'],
+            fontSize=14,
+            spaceBefore=15,
+            spaceAfter=10,
+            textColor=PDF_COLORS['title']
+        ),
+        'rate_label': ParagraphStyle('RateLabel', alignment=1, fontSize=14),
+    }
+    # Variantes colorées : texte brut plutôt que balises <font>/<b> à analyser
+    for kind in ('ok', 'ko', 'out'):
+        pdf_styles[f'section_{kind}'] = ParagraphStyle(
+            f'SectionTitle_{kind}', parent=pdf_styles['section'], textColor=PDF_COLORS[kind]
+        )
+    for kind in ('ok', 'ko'):
+        pdf_styles[f'rate_value_{kind}'] = ParagraphStyle(
+            f'RateValue_{kind}', alignment=1, fontSize=48, leading=50,
+            fontName='Helvetica-Bold', textColor=PDF_COLORS[kind]
+        )
+    pdf_styles['meta'] = ParagraphStyle('Meta', parent=sample['Normal'], textColor=PDF_COLORS['meta'])
+    pdf_styles['period'] = ParagraphStyle('Period', parent=sample['Normal'], fontSize=12, fontName='Helvetica-Bold')
+    pdf_styles['alert_ko'] = ParagraphStyle(
+        'AlertKo', parent=sample['Normal'], fontName='Helvetica-Bold', textColor=PDF_COLORS['ko']
+    )
+    return MappingProxyType(pdf_styles)
+
+
+@lru_cache(maxsize=None)
+def get_pdf_table_style(kind, font_size=8, grid_width=0.5, center_last_col=False):
+    """
+    Style de tableau PDF (en-tête coloré + lignes alternées) pour kind in ok/ko/out.
+    Mis en cache par combinaison : les TableStyle ne sont pas modifiés par Table.setStyle().
+    """
+    commands = [
+        ('BACKGROUND', (0, 0), (-1, 0), PDF_COLORS[kind]),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), font_size),
+        ('GRID', (0, 0), (-1, -1), grid_width, colors.grey),
+        ('ALIGN', (0, 0), (0, -1), 'CENTER'),
+    ]
+    if center_last_col:
+        commands.append(('ALIGN', (-1, 0), (-1, -1), 'CENTER'))
+    commands += [
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [PDF_COLORS[f'light_{kind}'], colors.white]),
+    ]
+    return TableStyle(commands)
+
+
+@lru_cache(maxsize=1)
+def get_pdf_summary_style():
+    """Partie fixe du style du tableau récapitulatif (les couleurs des valeurs s'y ajoutent)."""
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), PDF_COLORS['blue']),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, PDF_COLORS['stripe']]),
+    ])
+
+
+def summary_value_style(rows):
+    """
+    Style complet du récapitulatif : base partagée + fond coloré de la colonne Valeur.
+    rows : liste de (numéro de ligne, clé de couleur PDF_COLORS).
+    """
+    commands = []
+    for row, color in rows:
+        commands.append(('BACKGROUND', (1, row), (1, row), PDF_COLORS[color]))
+        commands.append(('TEXTCOLOR', (1, row), (1, row), colors.white))
+    return TableStyle(commands, parent=get_pdf_summary_style())
+
+
+# Nombre maximum de lignes par Table PDF (la mise en page ReportLab est super-linéaire)
+PDF_TABLE_CHUNK_ROWS = 500
+
+
+def chunked_tables(data, col_widths, style, chunk_size=PDF_TABLE_CHUNK_ROWS):
+    """
+    Découpe un grand tableau PDF en plusieurs Table de chunk_size lignes.
+    Chaque morceau reprend la ligne d'en-tête (data[0]) et se met en page seul.
+    """
+    header = data[0]
+    flowables = []
+    for start in range(1, max(len(data), 2), chunk_size):
+        if flowables:
+            flowables.append(Spacer(1, 0.2*cm))
+        table = Table([header] + data[start:start + chunk_size], colWidths=col_widths, repeatRows=1)
+        table.setStyle(style)
+        flowables.append(table)
+    return flowables
 
 
 # =============================================================================
 # RAPPORT EXCEL - PAGE RAPPORT
 # =============================================================================
 
+def build_hors_cmdb_rows(host_jobs):
+    """Lignes formatées de la feuille Hors CMDB (une par job, ou 'Non trouvé')."""
+    rows = []
+    for host, jobs in host_jobs:
+        if not jobs:
+            rows.append((host, "Non trouvé", None, None, None, None))
+            continue
+        for job in jobs:
+            rows.append((
+                host,
+                job.backup_time.strftime('%d/%m/%Y %H:%M') if job.backup_time else '',
+                job.policy_name or '',
+                job.schedule_name or '',
+                job.status or '',
+                round(job.taille_gb, 2) if job.taille_gb else 0
+            ))
+    return rows
+
+
+def build_conformes_detail_rows(host_jobs):
+    """Lignes formatées de la feuille Conformes - Détail (une par job, ou 'Job archivé')."""
+    rows = []
+    for host, jobs in host_jobs:
+        if not jobs:
+            rows.append((host, "CONFORME", "Job archivé", "-", "-", "-", "-", "-", "OK"))
+            continue
+        for job in jobs:
+            rows.append((
+                host,
+                "CONFORME",
+                job.backup_time.strftime('%d/%m/%Y %H:%M') if job.backup_time else '',
+                job.job_id or '',
+                job.policy_name or '',
+                job.schedule_name or '',
+                round(job.taille_gb, 2) if job.taille_gb else 0,
+                job.duree_minutes or 0,
+                job.status or ''
+            ))
+    return rows
+
+
 def generate_excel_report(conformite):
     """
     Génère un rapport Excel détaillé avec filtres sur les en-têtes.
+    Classeur en mode write-only : les lignes sont écrites en flux, sans grille en mémoire.
     """
     try:
-        import openpyxl
-        from openpyxl.utils import get_column_letter
-        
-        wb = openpyxl.Workbook()
-        jobs_map = get_jobs_map()
+        wb = openpyxl.Workbook(write_only=True)
+        jobs_map = _cached_jobs_map()
         styles = get_excel_styles()
+        register_excel_named_styles(wb, styles)
         
         # === SHEET 1: Résumé ===
-        ws = wb.active
-        ws.title = "Résumé"
-        
-        # Titre
-        ws['A1'] = "NetBackup Compliance Report"
-        ws['A1'].font = styles['title_font']
-        ws.merge_cells('A1:D1')
-        
-        ws['A2'] = f"Généré le {datetime.now().strftime('%d/%m/%Y à %H:%M')}"
-        ws['A2'].font = styles['subtitle_font']
-        ws.merge_cells('A2:D2')
+        ws = wb.create_sheet("Résumé")
         
         # Statistiques avec couleurs
         stats = [
@@ -102,151 +410,71 @@ def generate_excel_report(conformite):
             ("Jobs Analysés (24h)", conformite['total_jobs'], styles['header_fill_blue']),
         ]
         
-        for i, (label, value, fill) in enumerate(stats, 4):
-            ws[f'A{i}'] = label
-            ws[f'A{i}'].font = styles['stat_font']
-            ws[f'A{i}'].border = styles['thin_border']
-            ws[f'B{i}'] = value
-            ws[f'B{i}'].fill = fill
-            ws[f'B{i}'].font = styles['stat_value_font']
-            ws[f'B{i}'].alignment = styles['center_align']
-            ws[f'B{i}'].border = styles['thin_border']
-        
-        adjust_column_widths(ws, {'A': 35, 'B': 15})
+        append_summary_sheet(
+            ws,
+            "NetBackup Compliance Report",
+            f"Généré le {datetime.now().strftime('%d/%m/%Y à %H:%M')}",
+            stats,
+            {'A': 35, 'B': 15},
+            styles
+        )
         
         # === SHEET 2: Non Conformes (Anomalies en premier) ===
         if conformite['liste_non_conformes']:
             ws_ko = wb.create_sheet("⚠ Non Conformes")
+            adjust_column_widths(ws_ko, {'A': 30, 'B': 18, 'C': 45, 'D': 35})
+            ws_ko.freeze_panes = 'A2'
             
-            headers_ko = ['Hostname', 'Statut', 'Diagnostic', 'Action Requise']
-            for col, val in enumerate(headers_ko, 1):
-                cell = ws_ko.cell(row=1, column=col)
-                cell.value = val
-                cell.font = styles['header_font']
-                cell.fill = styles['header_fill_ko']
-                cell.alignment = styles['center_align']
-                cell.border = styles['thin_border']
+            append_header_row(ws_ko, ['Hostname', 'Statut', 'Diagnostic', 'Action Requise'], 'header_ko')
             
-            row_num = 2
             for host in conformite['liste_non_conformes']:
-                ws_ko.cell(row=row_num, column=1).value = host
-                ws_ko.cell(row=row_num, column=2).value = "NON CONFORME"
-                ws_ko.cell(row=row_num, column=3).value = "Aucun backup valide dans les 24 dernières heures"
-                ws_ko.cell(row=row_num, column=4).value = "Vérifier la configuration NetBackup"
-                
-                for c in range(1, 5):
-                    ws_ko.cell(row=row_num, column=c).fill = styles['row_fill_ko']
-                    ws_ko.cell(row=row_num, column=c).border = styles['thin_border']
-                row_num += 1
+                append_styled_row(ws_ko, [
+                    host,
+                    "NON CONFORME",
+                    "Aucun backup valide dans les 24 dernières heures",
+                    "Vérifier la configuration NetBackup"
+                ], 'row_ko')
             
             # Filtres automatiques
-            setup_excel_sheet_filters(ws_ko, 4, row_num - 1)
-            adjust_column_widths(ws_ko, {'A': 30, 'B': 18, 'C': 45, 'D': 35})
+            setup_excel_sheet_filters(ws_ko, 4, len(conformite['liste_non_conformes']) + 1)
         
         # === SHEET 3: Hors CMDB ===
         if conformite['liste_non_references']:
             ws_out = wb.create_sheet("⚡ Hors CMDB")
+            adjust_column_widths(ws_out, {'A': 30, 'B': 18, 'C': 40, 'D': 20, 'E': 12, 'F': 12})
+            ws_out.freeze_panes = 'A2'
             
-            headers_out = ['Hostname', 'Date Backup', 'Policy', 'Schedule', 'Statut Job', 'Taille (GB)']
-            for col, val in enumerate(headers_out, 1):
-                cell = ws_out.cell(row=1, column=col)
-                cell.value = val
-                cell.font = styles['header_font']
-                cell.fill = styles['header_fill_out']
-                cell.alignment = styles['center_align']
-                cell.border = styles['thin_border']
+            append_header_row(ws_out, ['Hostname', 'Date Backup', 'Policy', 'Schedule', 'Statut Job', 'Taille (GB)'],
+                              'header_out')
             
-            row_num = 2
-            for host in conformite['liste_non_references']:
-                norm_name = normalize_hostname(host)
-                jobs = jobs_map.get(norm_name, [])
-                
-                if jobs:
-                    for job in jobs:
-                        ws_out.cell(row=row_num, column=1).value = host
-                        ws_out.cell(row=row_num, column=2).value = job.backup_time.strftime('%d/%m/%Y %H:%M') if job.backup_time else ''
-                        ws_out.cell(row=row_num, column=3).value = job.policy_name or ''
-                        ws_out.cell(row=row_num, column=4).value = job.schedule_name or ''
-                        ws_out.cell(row=row_num, column=5).value = job.status or ''
-                        ws_out.cell(row=row_num, column=6).value = round(job.taille_gb, 2) if job.taille_gb else 0
-                        
-                        for c in range(1, 7):
-                            ws_out.cell(row=row_num, column=c).fill = styles['row_fill_out']
-                            ws_out.cell(row=row_num, column=c).border = styles['thin_border']
-                        row_num += 1
-                else:
-                    ws_out.cell(row=row_num, column=1).value = host
-                    ws_out.cell(row=row_num, column=2).value = "Non trouvé"
-                    for c in range(1, 7):
-                        ws_out.cell(row=row_num, column=c).fill = styles['row_fill_out']
-                        ws_out.cell(row=row_num, column=c).border = styles['thin_border']
-                    row_num += 1
+            rows = build_hors_cmdb_rows(zip_host_jobs(conformite['liste_non_references'], jobs_map))
+            for row in rows:
+                append_styled_row(ws_out, row, 'row_out')
             
-            setup_excel_sheet_filters(ws_out, 6, row_num - 1)
-            adjust_column_widths(ws_out, {'A': 30, 'B': 18, 'C': 40, 'D': 20, 'E': 12, 'F': 12})
+            setup_excel_sheet_filters(ws_out, 6, len(rows) + 1)
         
         # === SHEET 4: Détail Complet (Conformes) ===
         ws_detail = wb.create_sheet("✓ Conformes - Détail")
-        
-        headers = ['Hostname', 'Statut Global', 'Date Backup', 'Job ID', 
-                   'Policy', 'Schedule', 'Taille (GB)', 'Durée (min)', 'Statut Job']
-        
-        for col, val in enumerate(headers, 1):
-            cell = ws_detail.cell(row=1, column=col)
-            cell.value = val
-            cell.font = styles['header_font']
-            cell.fill = styles['header_fill_ok']
-            cell.alignment = styles['center_align']
-            cell.border = styles['thin_border']
-        
-        row_num = 2
-        for host_cmdb in conformite['liste_conformes']:
-            norm_name = normalize_hostname(host_cmdb)
-            jobs = jobs_map.get(norm_name, [])
-            
-            if jobs:
-                for job in jobs:
-                    ws_detail.cell(row=row_num, column=1).value = host_cmdb
-                    ws_detail.cell(row=row_num, column=2).value = "CONFORME"
-                    ws_detail.cell(row=row_num, column=3).value = job.backup_time.strftime('%d/%m/%Y %H:%M') if job.backup_time else ''
-                    ws_detail.cell(row=row_num, column=4).value = job.job_id or ''
-                    ws_detail.cell(row=row_num, column=5).value = job.policy_name or ''
-                    ws_detail.cell(row=row_num, column=6).value = job.schedule_name or ''
-                    ws_detail.cell(row=row_num, column=7).value = round(job.taille_gb, 2) if job.taille_gb else 0
-                    ws_detail.cell(row=row_num, column=8).value = job.duree_minutes or 0
-                    ws_detail.cell(row=row_num, column=9).value = job.status or ''
-                    
-                    for c in range(1, 10):
-                        ws_detail.cell(row=row_num, column=c).fill = styles['row_fill_ok']
-                        ws_detail.cell(row=row_num, column=c).border = styles['thin_border']
-                    row_num += 1
-            else:
-                ws_detail.cell(row=row_num, column=1).value = host_cmdb
-                ws_detail.cell(row=row_num, column=2).value = "CONFORME"
-                ws_detail.cell(row=row_num, column=3).value = "Job archivé"
-                for c in [4, 5, 6, 7, 8]:
-                    ws_detail.cell(row=row_num, column=c).value = "-"
-                ws_detail.cell(row=row_num, column=9).value = "OK"
-                for c in range(1, 10):
-                    ws_detail.cell(row=row_num, column=c).fill = styles['row_fill_ok']
-                    ws_detail.cell(row=row_num, column=c).border = styles['thin_border']
-                row_num += 1
-        
-        # Filtres automatiques
-        setup_excel_sheet_filters(ws_detail, 9, row_num - 1)
         adjust_column_widths(ws_detail, {
             'A': 28, 'B': 15, 'C': 18, 'D': 15, 
             'E': 40, 'F': 20, 'G': 12, 'H': 12, 'I': 12
         })
+        ws_detail.freeze_panes = 'A2'
+        
+        append_header_row(ws_detail, ['Hostname', 'Statut Global', 'Date Backup', 'Job ID', 
+                                      'Policy', 'Schedule', 'Taille (GB)', 'Durée (min)', 'Statut Job'],
+                          'header_ok')
+        
+        rows = build_conformes_detail_rows(zip_host_jobs(conformite['liste_conformes'], jobs_map))
+        for row in rows:
+            append_styled_row(ws_detail, row, 'row_ok')
         
-        # Figer la première ligne sur toutes les feuilles
-        for sheet in wb.worksheets:
-            if sheet.title != "Résumé":
-                sheet.freeze_panes = 'A2'
+        # Filtres automatiques
+        setup_excel_sheet_filters(ws_detail, 9, len(rows) + 1)
         
         # Sauvegarder
-        buffer = io.BytesIO()
-        wb.save(buffer)
+        buffer = new_report_buffer()
+        save_workbook(wb, buffer)
         buffer.seek(0)
         return buffer
         
@@ -267,13 +495,7 @@ def generate_pdf_report(conformite):
     - Codes couleur appropriés
     """
     try:
-        from reportlab.lib.pagesizes import A4, landscape
-        from reportlab.lib import colors
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-        from reportlab.lib.units import cm
-        
-        buffer = io.BytesIO()
+        buffer = new_report_buffer()
         doc = SimpleDocTemplate(
             buffer, 
             pagesize=landscape(A4),
@@ -284,59 +506,30 @@ def generate_pdf_report(conformite):
         )
         
         elements = []
-        styles = getSampleStyleSheet()
-        jobs_map = get_jobs_map()
-        
-        # Couleurs
-        COLOR_OK = colors.HexColor('#198754')
-        COLOR_KO = colors.HexColor('#dc3545')
-        COLOR_OUT = colors.HexColor('#FF8C00')
-        COLOR_BLUE = colors.HexColor('#4472C4')
-        COLOR_LIGHT_OK = colors.HexColor('#E2EFDA')
-        COLOR_LIGHT_KO = colors.HexColor('#FCE4D6')
-        COLOR_LIGHT_OUT = colors.HexColor('#FFF3CD')
-        
-        # Styles personnalisés
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=20,
-            spaceAfter=20,
-            textColor=colors.HexColor('#1F4E78')
-        )
-        
-        section_style = ParagraphStyle(
-            'SectionTitle',
-            parent=styles['Heading2'],
-            fontSize=14,
-            spaceBefore=15,
-            spaceAfter=10,
-            textColor=colors.HexColor('#1F4E78')
-        )
+        styles = get_pdf_styles()
+        jobs_map = _cached_jobs_map()
         
         # === PAGE 1: Titre et Résumé ===
         elements.append(Paragraph(
             f"NetBackup Compliance Report", 
-            title_style
+            styles['title']
         ))
         elements.append(Paragraph(
-            f"<font size='10' color='#666666'>Généré le {datetime.now().strftime('%d/%m/%Y à %H:%M')} - Période analysée: 24 dernières heures</font>",
-            styles['Normal']
+            f"Généré le {datetime.now().strftime('%d/%m/%Y à %H:%M')} - Période analysée: 24 dernières heures",
+            styles['meta']
         ))
         elements.append(Spacer(1, 1*cm))
         
         # Taux de conformité mis en avant - CORRIGÉ: espacement et styles séparés
-        rate_color = '#198754' if conformite['taux_conformite'] >= 95 else '#dc3545'
-        rate_style = ParagraphStyle('RateValue', alignment=1, fontSize=48, leading=50)
+        rate_kind = 'ok' if conformite['taux_conformite'] >= 95 else 'ko'
         elements.append(Paragraph(
-            f"<font color='{rate_color}'><b>{conformite['taux_conformite']}%</b></font>",
-            rate_style
+            f"{conformite['taux_conformite']}%",
+            styles[f'rate_value_{rate_kind}']
         ))
         elements.append(Spacer(1, 0.3*cm))
-        label_style = ParagraphStyle('RateLabel', alignment=1, fontSize=14)
         elements.append(Paragraph(
             f"Taux de Conformité Global",
-            label_style
+            styles['rate_label']
         ))
         elements.append(Spacer(1, 1*cm))
         
@@ -351,22 +544,10 @@ def generate_pdf_report(conformite):
         ]
         
         summary_table = Table(summary_data, colWidths=[10*cm, 4*cm, 6*cm])
-        summary_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), COLOR_BLUE),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')]),
-            # Couleurs spécifiques pour les valeurs
-            ('BACKGROUND', (1, 2), (1, 2), COLOR_OK),  # Conformes
-            ('TEXTCOLOR', (1, 2), (1, 2), colors.white),
-            ('BACKGROUND', (1, 3), (1, 3), COLOR_KO if conformite['non_conformes'] > 0 else COLOR_OK),
-            ('TEXTCOLOR', (1, 3), (1, 3), colors.white),
-            ('BACKGROUND', (1, 4), (1, 4), COLOR_OUT if conformite['non_references'] > 0 else COLOR_OK),
-            ('TEXTCOLOR', (1, 4), (1, 4), colors.white),
+        summary_table.setStyle(summary_value_style([
+            (2, 'ok'),  # Conformes
+            (3, 'ko' if conformite['non_conformes'] > 0 else 'ok'),
+            (4, 'out' if conformite['non_references'] > 0 else 'ok'),
         ]))
         elements.append(summary_table)
         
@@ -374,120 +555,80 @@ def generate_pdf_report(conformite):
         if conformite['liste_non_conformes']:
             elements.append(PageBreak())
             elements.append(Paragraph(
-                f"<font color='#dc3545'>⚠ ANOMALIES - Serveurs Non Conformes ({len(conformite['liste_non_conformes'])})</font>", 
-                section_style
+                f"⚠ ANOMALIES - Serveurs Non Conformes ({len(conformite['liste_non_conformes'])})", 
+                styles['section_ko']
             ))
             elements.append(Paragraph(
-                "<font size='10' color='#dc3545'><b>Action immédiate requise - Ces serveurs n'ont pas de backup valide dans les 24 dernières heures</b></font>",
-                styles['Normal']
+                "Action immédiate requise - Ces serveurs n'ont pas de backup valide dans les 24 dernières heures",
+                styles['alert_ko']
             ))
             elements.append(Spacer(1, 0.3*cm))
             
-            data_ko = [['#', 'Hostname', 'Diagnostic', 'Action Requise']]
-            for idx, h in enumerate(conformite['liste_non_conformes'], 1):
-                data_ko.append([
-                    str(idx), 
-                    h, 
-                    'Aucun backup valide (24h)', 
-                    'Vérifier configuration NetBackup'
-                ])
+            data_ko = [['#', 'Hostname', 'Diagnostic', 'Action Requise']] + [
+                [str(idx), h, 'Aucun backup valide (24h)', 'Vérifier configuration NetBackup']
+                for idx, h in enumerate(conformite['liste_non_conformes'], 1)
+            ]
             
-            table_ko = Table(data_ko, colWidths=[1*cm, 8*cm, 8*cm, 8*cm], repeatRows=1)
-            table_ko.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), COLOR_KO),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 9),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                ('ALIGN', (0, 0), (0, -1), 'CENTER'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [COLOR_LIGHT_KO, colors.white]),
-            ]))
-            elements.append(table_ko)
+            elements.extend(chunked_tables(
+                data_ko, [1*cm, 8*cm, 8*cm, 8*cm],
+                get_pdf_table_style('ko', font_size=9)
+            ))
         
         # === SECTION HORS CMDB ===
         if conformite['liste_non_references']:
             elements.append(PageBreak())
             elements.append(Paragraph(
-                f"<font color='#FF8C00'>⚡ Serveurs Hors CMDB ({len(conformite['liste_non_references'])})</font>", 
-                section_style
+                f"⚡ Serveurs Hors CMDB ({len(conformite['liste_non_references'])})", 
+                styles['section_out']
             ))
             elements.append(Paragraph(
-                "<font size='10'>Ces serveurs effectuent des backups mais ne sont pas référencés dans la CMDB</font>",
-                styles['Normal']
+                "Ces serveurs effectuent des backups mais ne sont pas référencés dans la CMDB",
+                styles['normal']
             ))
             elements.append(Spacer(1, 0.3*cm))
             
-            data_out = [['#', 'Hostname', 'Date Backup', 'Policy', 'Statut']]
-            for idx, host in enumerate(conformite['liste_non_references'], 1):
-                norm_name = normalize_hostname(host)
-                jobs = jobs_map.get(norm_name, [])
-                if jobs:
-                    job = jobs[0]
-                    data_out.append([
-                        str(idx),
-                        host[:35],
-                        job.backup_time.strftime('%d/%m/%Y %H:%M') if job.backup_time else '-',
-                        (job.policy_name or '')[:35],
-                        job.status or '-'
-                    ])
-                else:
-                    data_out.append([str(idx), host[:35], '-', '-', '-'])
+            data_out = [['#', 'Hostname', 'Date Backup', 'Policy', 'Statut']] + [
+                [
+                    str(idx),
+                    host[:35],
+                    job.backup_time.strftime('%d/%m/%Y %H:%M') if job.backup_time else '-',
+                    (job.policy_name or '')[:35],
+                    job.status or '-'
+                ] if job else [str(idx), host[:35], '-', '-', '-']
+                for idx, (host, jobs) in enumerate(zip_host_jobs(conformite['liste_non_references'], jobs_map), 1)
+                for job in (jobs[:1] or (None,))
+            ]
             
-            table_out = Table(data_out, colWidths=[1*cm, 8*cm, 5*cm, 9*cm, 2*cm], repeatRows=1)
-            table_out.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), COLOR_OUT),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 8),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                ('ALIGN', (0, 0), (0, -1), 'CENTER'),
-                ('ALIGN', (-1, 0), (-1, -1), 'CENTER'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [COLOR_LIGHT_OUT, colors.white]),
-            ]))
-            elements.append(table_out)
+            elements.extend(chunked_tables(
+                data_out, [1*cm, 8*cm, 5*cm, 9*cm, 2*cm],
+                get_pdf_table_style('out', center_last_col=True)
+            ))
         
         # === SECTION CONFORMES - TOUS LES SERVEURS ===
         if conformite['liste_conformes']:
             elements.append(PageBreak())
             elements.append(Paragraph(
-                f"<font color='#198754'>✓ Serveurs Conformes ({len(conformite['liste_conformes'])})</font>", 
-                section_style
+                f"✓ Serveurs Conformes ({len(conformite['liste_conformes'])})", 
+                styles['section_ok']
             ))
             elements.append(Spacer(1, 0.3*cm))
             
-            data_ok = [['#', 'Hostname', 'Date Backup', 'Policy', 'Statut']]
-            count = 0
-            for hostname in conformite['liste_conformes']:
-                norm_name = normalize_hostname(hostname)
-                jobs = jobs_map.get(norm_name, [])
-                count += 1
-                if jobs:
-                    job = jobs[0]
-                    data_ok.append([
-                        str(count),
-                        hostname[:35],
-                        job.backup_time.strftime('%d/%m/%Y %H:%M') if job.backup_time else '-',
-                        (job.policy_name or '')[:35],
-                        job.status or 'OK'
-                    ])
-                else:
-                    data_ok.append([str(count), hostname[:35], '-', 'Archivé', 'OK'])
+            data_ok = [['#', 'Hostname', 'Date Backup', 'Policy', 'Statut']] + [
+                [
+                    str(count),
+                    hostname[:35],
+                    job.backup_time.strftime('%d/%m/%Y %H:%M') if job.backup_time else '-',
+                    (job.policy_name or '')[:35],
+                    job.status or 'OK'
+                ] if job else [str(count), hostname[:35], '-', 'Archivé', 'OK']
+                for count, (hostname, jobs) in enumerate(zip_host_jobs(conformite['liste_conformes'], jobs_map), 1)
+                for job in (jobs[:1] or (None,))
+            ]
             
-            table_ok = Table(data_ok, colWidths=[1*cm, 8*cm, 5*cm, 9*cm, 2*cm], repeatRows=1)
-            table_ok.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), COLOR_OK),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 8),
-                ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
-                ('ALIGN', (0, 0), (0, -1), 'CENTER'),
-                ('ALIGN', (-1, 0), (-1, -1), 'CENTER'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [COLOR_LIGHT_OK, colors.white]),
-            ]))
-            elements.append(table_ok)
+            elements.extend(chunked_tables(
+                data_ok, [1*cm, 8*cm, 5*cm, 9*cm, 2*cm],
+                get_pdf_table_style('ok', grid_width=0.25, center_last_col=True)
+            ))
         
         doc.build(elements)
         buffer.seek(0)
@@ -507,130 +648,81 @@ def generate_excel_report_archive(conformite, archive):
     Génère un Excel pour une archive - même format que le rapport standard.
     """
     try:
-        import openpyxl
-        from openpyxl.utils import get_column_letter
-        
-        wb = openpyxl.Workbook()
+        wb = openpyxl.Workbook(write_only=True)
         styles = get_excel_styles()
+        register_excel_named_styles(wb, styles)
         
         date_debut = archive.date_debut_periode.strftime('%d/%m/%Y %Hh')
         date_fin = archive.date_fin_periode.strftime('%d/%m/%Y %Hh')
         
-        # === SHEET 1: Résumé ===
-        ws = wb.active
-        ws.title = "Résumé"
+        # Tailles des listes, réutilisées dans le résumé, les titres et les filtres
+        n_ok = len(conformite['liste_conformes'])
+        n_ko = len(conformite['liste_non_conformes'])
+        n_out = len(conformite['liste_non_references'])
         
-        ws['A1'] = f"Archive NetBackup - {date_debut} → {date_fin}"
-        ws['A1'].font = styles['title_font']
-        ws.merge_cells('A1:D1')
-        
-        ws['A2'] = f"Archivé le {archive.date_archivage.strftime('%d/%m/%Y à %H:%M')}"
-        ws['A2'].font = styles['subtitle_font']
-        ws.merge_cells('A2:D2')
+        # === SHEET 1: Résumé ===
+        ws = wb.create_sheet("Résumé")
         
         stats = [
             ("Période", f"{date_debut} → {date_fin}", styles['header_fill_blue']),
             ("Taux de Conformité", f"{conformite['taux_conformite']}%", 
              styles['header_fill_ok'] if conformite['taux_conformite'] >= 95 else styles['header_fill_ko']),
             ("Serveurs Attendus", conformite.get('total_attendus', conformite.get('total_backup_enabled', 0)), styles['header_fill_blue']),
-            ("Serveurs Conformes", len(conformite['liste_conformes']), styles['header_fill_ok']),
-            ("Serveurs Non Conformes", len(conformite['liste_non_conformes']), styles['header_fill_ko']),
-            ("Serveurs Hors CMDB", len(conformite['liste_non_references']), styles['header_fill_out']),
+            ("Serveurs Conformes", n_ok, styles['header_fill_ok']),
+            ("Serveurs Non Conformes", n_ko, styles['header_fill_ko']),
+            ("Serveurs Hors CMDB", n_out, styles['header_fill_out']),
             ("Total Jobs", conformite['total_jobs'], styles['header_fill_blue']),
         ]
         
-        for i, (label, value, fill) in enumerate(stats, 4):
-            ws[f'A{i}'] = label
-            ws[f'A{i}'].font = styles['stat_font']
-            ws[f'A{i}'].border = styles['thin_border']
-            ws[f'B{i}'] = value
-            ws[f'B{i}'].fill = fill
-            ws[f'B{i}'].font = styles['stat_value_font']
-            ws[f'B{i}'].alignment = styles['center_align']
-            ws[f'B{i}'].border = styles['thin_border']
-        
-        adjust_column_widths(ws, {'A': 35, 'B': 25})
+        append_summary_sheet(
+            ws,
+            f"Archive NetBackup - {date_debut} → {date_fin}",
+            f"Archivé le {archive.date_archivage.strftime('%d/%m/%Y à %H:%M')}",
+            stats,
+            {'A': 35, 'B': 25},
+            styles
+        )
         
         # === SHEET 2: Non Conformes ===
         if conformite['liste_non_conformes']:
             ws_ko = wb.create_sheet("⚠ Non Conformes")
+            adjust_column_widths(ws_ko, {'A': 8, 'B': 35, 'C': 45})
+            ws_ko.freeze_panes = 'A2'
             
-            headers_ko = ['#', 'Hostname', 'Diagnostic']
-            for col, val in enumerate(headers_ko, 1):
-                cell = ws_ko.cell(row=1, column=col)
-                cell.value = val
-                cell.font = styles['header_font']
-                cell.fill = styles['header_fill_ko']
-                cell.alignment = styles['center_align']
-                cell.border = styles['thin_border']
-            
+            append_header_row(ws_ko, ['#', 'Hostname', 'Diagnostic'], 'header_ko')
             for idx, h in enumerate(conformite['liste_non_conformes'], 1):
-                row_num = idx + 1
-                ws_ko.cell(row=row_num, column=1).value = idx
-                ws_ko.cell(row=row_num, column=2).value = h
-                ws_ko.cell(row=row_num, column=3).value = "Aucun backup valide pendant la période"
-                for c in range(1, 4):
-                    ws_ko.cell(row=row_num, column=c).fill = styles['row_fill_ko']
-                    ws_ko.cell(row=row_num, column=c).border = styles['thin_border']
+                append_styled_row(ws_ko, [idx, h, "Aucun backup valide pendant la période"],
+                                  'row_ko')
             
-            setup_excel_sheet_filters(ws_ko, 3, len(conformite['liste_non_conformes']) + 1)
-            adjust_column_widths(ws_ko, {'A': 8, 'B': 35, 'C': 45})
-            ws_ko.freeze_panes = 'A2'
+            setup_excel_sheet_filters(ws_ko, 3, n_ko + 1)
         
         # === SHEET 3: Hors CMDB ===
         if conformite['liste_non_references']:
             ws_out = wb.create_sheet("⚡ Hors CMDB")
+            adjust_column_widths(ws_out, {'A': 8, 'B': 35, 'C': 50})
+            ws_out.freeze_panes = 'A2'
             
-            headers_out = ['#', 'Hostname', 'Remarque']
-            for col, val in enumerate(headers_out, 1):
-                cell = ws_out.cell(row=1, column=col)
-                cell.value = val
-                cell.font = styles['header_font']
-                cell.fill = styles['header_fill_out']
-                cell.alignment = styles['center_align']
-                cell.border = styles['thin_border']
-            
+            append_header_row(ws_out, ['#', 'Hostname', 'Remarque'], 'header_out')
             for idx, h in enumerate(conformite['liste_non_references'], 1):
-                row_num = idx + 1
-                ws_out.cell(row=row_num, column=1).value = idx
-                ws_out.cell(row=row_num, column=2).value = h
-                ws_out.cell(row=row_num, column=3).value = "Backup effectué mais serveur non référencé CMDB"
-                for c in range(1, 4):
-                    ws_out.cell(row=row_num, column=c).fill = styles['row_fill_out']
-                    ws_out.cell(row=row_num, column=c).border = styles['thin_border']
+                append_styled_row(ws_out, [idx, h, "Backup effectué mais serveur non référencé CMDB"],
+                                  'row_out')
             
-            setup_excel_sheet_filters(ws_out, 3, len(conformite['liste_non_references']) + 1)
-            adjust_column_widths(ws_out, {'A': 8, 'B': 35, 'C': 50})
-            ws_out.freeze_panes = 'A2'
+            setup_excel_sheet_filters(ws_out, 3, n_out + 1)
         
         # === SHEET 4: Conformes ===
         if conformite['liste_conformes']:
             ws_ok = wb.create_sheet("✓ Conformes")
+            adjust_column_widths(ws_ok, {'A': 8, 'B': 35, 'C': 15})
+            ws_ok.freeze_panes = 'A2'
             
-            headers_ok = ['#', 'Hostname', 'Statut']
-            for col, val in enumerate(headers_ok, 1):
-                cell = ws_ok.cell(row=1, column=col)
-                cell.value = val
-                cell.font = styles['header_font']
-                cell.fill = styles['header_fill_ok']
-                cell.alignment = styles['center_align']
-                cell.border = styles['thin_border']
-            
+            append_header_row(ws_ok, ['#', 'Hostname', 'Statut'], 'header_ok')
             for idx, h in enumerate(conformite['liste_conformes'], 1):
-                row_num = idx + 1
-                ws_ok.cell(row=row_num, column=1).value = idx
-                ws_ok.cell(row=row_num, column=2).value = h
-                ws_ok.cell(row=row_num, column=3).value = "CONFORME"
-                for c in range(1, 4):
-                    ws_ok.cell(row=row_num, column=c).fill = styles['row_fill_ok']
-                    ws_ok.cell(row=row_num, column=c).border = styles['thin_border']
+                append_styled_row(ws_ok, [idx, h, "CONFORME"], 'row_ok')
             
-            setup_excel_sheet_filters(ws_ok, 3, len(conformite['liste_conformes']) + 1)
-            adjust_column_widths(ws_ok, {'A': 8, 'B': 35, 'C': 15})
-            ws_ok.freeze_panes = 'A2'
+            setup_excel_sheet_filters(ws_ok, 3, n_ok + 1)
         
-        buffer = io.BytesIO()
-        wb.save(buffer)
+        buffer = new_report_buffer()
+        save_workbook(wb, buffer)
         buffer.seek(0)
         return buffer
         
@@ -650,13 +742,7 @@ def generate_pdf_report_archive(conformite, archive):
     - En-têtes répétés sur chaque page
     """
     try:
-        from reportlab.lib.pagesizes import A4, landscape
-        from reportlab.lib import colors
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-        from reportlab.lib.units import cm
-        
-        buffer = io.BytesIO()
+        buffer = new_report_buffer()
         doc = SimpleDocTemplate(
             buffer, 
             pagesize=landscape(A4), 
@@ -667,65 +753,41 @@ def generate_pdf_report_archive(conformite, archive):
         )
         
         elements = []
-        styles = getSampleStyleSheet()
-        
-        # Couleurs
-        COLOR_OK = colors.HexColor('#198754')
-        COLOR_KO = colors.HexColor('#dc3545')
-        COLOR_OUT = colors.HexColor('#FF8C00')
-        COLOR_BLUE = colors.HexColor('#4472C4')
-        COLOR_LIGHT_OK = colors.HexColor('#E2EFDA')
-        COLOR_LIGHT_KO = colors.HexColor('#FCE4D6')
-        COLOR_LIGHT_OUT = colors.HexColor('#FFF3CD')
+        styles = get_pdf_styles()
         
         date_debut = conformite['date_debut_periode'].strftime('%d/%m/%Y %Hh')
         date_fin = conformite['date_fin_periode'].strftime('%d/%m/%Y %Hh')
         
-        # Styles
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            spaceAfter=15,
-            textColor=colors.HexColor('#1F4E78')
-        )
-        
-        section_style = ParagraphStyle(
-            'SectionTitle',
-            parent=styles['Heading2'],
-            fontSize=14,
-            spaceBefore=15,
-            spaceAfter=10,
-            textColor=colors.HexColor('#1F4E78')
-        )
+        # Tailles des listes, réutilisées dans le résumé, les titres et les filtres
+        n_ok = len(conformite['liste_conformes'])
+        n_ko = len(conformite['liste_non_conformes'])
+        n_out = len(conformite['liste_non_references'])
         
         # === PAGE 1: Titre et Résumé ===
         elements.append(Paragraph(
             f"Archive NetBackup", 
-            title_style
+            styles['archive_title']
         ))
         elements.append(Paragraph(
-            f"<font size='12'><b>Période: {date_debut} → {date_fin}</b></font>",
-            styles['Normal']
+            f"Période: {date_debut} → {date_fin}",
+            styles['period']
         ))
         elements.append(Paragraph(
-            f"<font size='10' color='#666666'>Archivé le {archive.date_archivage.strftime('%d/%m/%Y à %H:%M')}</font>",
-            styles['Normal']
+            f"Archivé le {archive.date_archivage.strftime('%d/%m/%Y à %H:%M')}",
+            styles['meta']
         ))
         elements.append(Spacer(1, 1*cm))
         
         # Taux de conformité - CORRIGÉ: espacement et styles séparés
-        rate_color = '#198754' if conformite['taux_conformite'] >= 95 else '#dc3545'
-        rate_style = ParagraphStyle('RateValue', alignment=1, fontSize=48, leading=50)
+        rate_kind = 'ok' if conformite['taux_conformite'] >= 95 else 'ko'
         elements.append(Paragraph(
-            f"<font color='{rate_color}'><b>{conformite['taux_conformite']}%</b></font>",
-            rate_style
+            f"{conformite['taux_conformite']}%",
+            styles[f'rate_value_{rate_kind}']
         ))
         elements.append(Spacer(1, 0.3*cm))
-        label_style = ParagraphStyle('RateLabel', alignment=1, fontSize=14)
         elements.append(Paragraph(
             f"Taux de Conformité",
-            label_style
+            styles['rate_label']
         ))
         elements.append(Spacer(1, 1*cm))
         
@@ -734,29 +796,17 @@ def generate_pdf_report_archive(conformite, archive):
             ['Métrique', 'Valeur'],
             ['Période couverte', f"{date_debut} → {date_fin}"],
             ['Serveurs Attendus', str(conformite.get('total_attendus', conformite.get('total_backup_enabled', 0)))],
-            ['Serveurs Conformes', str(len(conformite['liste_conformes']))],
-            ['Serveurs Non Conformes', str(len(conformite['liste_non_conformes']))],
-            ['Serveurs Hors CMDB', str(len(conformite['liste_non_references']))],
+            ['Serveurs Conformes', str(n_ok)],
+            ['Serveurs Non Conformes', str(n_ko)],
+            ['Serveurs Hors CMDB', str(n_out)],
             ['Total Jobs', str(conformite['total_jobs'])],
         ]
         
         summary_table = Table(summary_data, colWidths=[10*cm, 6*cm])
-        summary_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), COLOR_BLUE),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')]),
-            # Couleurs spécifiques
-            ('BACKGROUND', (1, 3), (1, 3), COLOR_OK),
-            ('TEXTCOLOR', (1, 3), (1, 3), colors.white),
-            ('BACKGROUND', (1, 4), (1, 4), COLOR_KO if len(conformite['liste_non_conformes']) > 0 else COLOR_OK),
-            ('TEXTCOLOR', (1, 4), (1, 4), colors.white),
-            ('BACKGROUND', (1, 5), (1, 5), COLOR_OUT if len(conformite['liste_non_references']) > 0 else COLOR_OK),
-            ('TEXTCOLOR', (1, 5), (1, 5), colors.white),
+        summary_table.setStyle(summary_value_style([
+            (3, 'ok'),
+            (4, 'ko' if n_ko else 'ok'),
+            (5, 'out' if n_out else 'ok'),
         ]))
         elements.append(summary_table)
         
@@ -764,87 +814,66 @@ def generate_pdf_report_archive(conformite, archive):
         if conformite['liste_non_conformes']:
             elements.append(PageBreak())
             elements.append(Paragraph(
-                f"<font color='#dc3545'>⚠ ANOMALIES - Serveurs Non Conformes ({len(conformite['liste_non_conformes'])})</font>", 
-                section_style
+                f"⚠ ANOMALIES - Serveurs Non Conformes ({n_ko})", 
+                styles['section_ko']
             ))
             elements.append(Paragraph(
-                "<font size='10' color='#dc3545'><b>Ces serveurs n'avaient pas de backup valide pendant la période archivée</b></font>",
-                styles['Normal']
+                "Ces serveurs n'avaient pas de backup valide pendant la période archivée",
+                styles['alert_ko']
             ))
             elements.append(Spacer(1, 0.3*cm))
             
-            data_ko = [['#', 'Hostname', 'Diagnostic']]
-            for idx, h in enumerate(conformite['liste_non_conformes'], 1):
-                data_ko.append([str(idx), h, 'Aucun backup valide pendant la période'])
+            data_ko = [['#', 'Hostname', 'Diagnostic']] + [
+                [str(idx), h, 'Aucun backup valide pendant la période']
+                for idx, h in enumerate(conformite['liste_non_conformes'], 1)
+            ]
             
-            table_ko = Table(data_ko, colWidths=[1*cm, 10*cm, 14*cm], repeatRows=1)
-            table_ko.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), COLOR_KO),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 9),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                ('ALIGN', (0, 0), (0, -1), 'CENTER'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [COLOR_LIGHT_KO, colors.white]),
-            ]))
-            elements.append(table_ko)
+            elements.extend(chunked_tables(
+                data_ko, [1*cm, 10*cm, 14*cm],
+                get_pdf_table_style('ko', font_size=9)
+            ))
         
         # === SECTION HORS CMDB ===
         if conformite['liste_non_references']:
             elements.append(PageBreak())
             elements.append(Paragraph(
-                f"<font color='#FF8C00'>⚡ Serveurs Hors CMDB ({len(conformite['liste_non_references'])})</font>", 
-                section_style
+                f"⚡ Serveurs Hors CMDB ({n_out})", 
+                styles['section_out']
             ))
             elements.append(Paragraph(
-                "<font size='10'>Serveurs ayant effectué des backups mais non référencés dans la CMDB</font>",
-                styles['Normal']
+                "Serveurs ayant effectué des backups mais non référencés dans la CMDB",
+                styles['normal']
             ))
             elements.append(Spacer(1, 0.3*cm))
             
-            data_out = [['#', 'Hostname', 'Remarque']]
-            for idx, h in enumerate(conformite['liste_non_references'], 1):
-                data_out.append([str(idx), h, 'Non référencé dans CMDB'])
+            data_out = [['#', 'Hostname', 'Remarque']] + [
+                [str(idx), h, 'Non référencé dans CMDB']
+                for idx, h in enumerate(conformite['liste_non_references'], 1)
+            ]
             
-            table_out = Table(data_out, colWidths=[1*cm, 12*cm, 12*cm], repeatRows=1)
-            table_out.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), COLOR_OUT),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 8),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                ('ALIGN', (0, 0), (0, -1), 'CENTER'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [COLOR_LIGHT_OUT, colors.white]),
-            ]))
-            elements.append(table_out)
+            elements.extend(chunked_tables(
+                data_out, [1*cm, 12*cm, 12*cm],
+                get_pdf_table_style('out')
+            ))
         
         # === SECTION CONFORMES ===
         if conformite['liste_conformes']:
             elements.append(PageBreak())
             elements.append(Paragraph(
-                f"<font color='#198754'>✓ Serveurs Conformes ({len(conformite['liste_conformes'])})</font>", 
-                section_style
+                f"✓ Serveurs Conformes ({n_ok})", 
+                styles['section_ok']
             ))
             elements.append(Spacer(1, 0.3*cm))
             
-            data_ok = [['#', 'Hostname', 'Statut']]
-            for idx, h in enumerate(conformite['liste_conformes'], 1):
-                data_ok.append([str(idx), h, 'CONFORME'])
+            data_ok = [['#', 'Hostname', 'Statut']] + [
+                [str(idx), h, 'CONFORME']
+                for idx, h in enumerate(conformite['liste_conformes'], 1)
+            ]
             
-            table_ok = Table(data_ok, colWidths=[1*cm, 14*cm, 10*cm], repeatRows=1)
-            table_ok.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), COLOR_OK),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 8),
-                ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
-                ('ALIGN', (0, 0), (0, -1), 'CENTER'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [COLOR_LIGHT_OK, colors.white]),
-            ]))
-            elements.append(table_ok)
+            elements.extend(chunked_tables(
+                data_ok, [1*cm, 14*cm, 10*cm],
+                get_pdf_table_style('ok', grid_width=0.25)
+            ))
         
         doc.build(elements)
         buffer.seek(0)
@@ -3,12 +3,16 @@ Service de signalisation pour recharger le scheduler dynamiquement
 Utilise Redis pub/sub pour communication inter-processus
 """
 import logging
+import time
 import redis
-import threading
 from flask import current_app
 
 logger = logging.getLogger(__name__)
 
+# Attente maximale d'un message par le listener (s) et pause après une erreur Redis
+LISTENER_POLL_TIMEOUT = 1.0
+LISTENER_RETRY_DELAY = 5
+
 class SchedulerReloadService:
     """Service pour signaler au scheduler de recharger ses jobs"""
     
@@ -16,6 +20,7 @@ class SchedulerReloadService:
         self.redis_client = None
         self.pubsub = None
         self.listener_thread = None
+        self.scheduler_service = None
         self.app = None  # Stocker l'app pour le contexte
         self._initialize_redis()
     
@@ -76,9 +81,45 @@ class SchedulerReloadService:
             logger.error(f"Erreur envoi signal reload all: {e}")
             return False
     
+    def signal_reload_imap(self):
+        """Envoie un signal pour reprogrammer la tâche IMAP"""
+        if not self.redis_client:
+            logger.warning("Redis non disponible - signal reload ignoré")
+            return False
+        
+        try:
+            self.redis_client.publish('scheduler:reload', 'imap')
+            logger.info("Signal reload IMAP envoyé")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Erreur envoi signal reload IMAP: {e}")
+            return False
+    
+    def signal_event(self, event):
+        """
+        Publie un évènement applicatif sur le canal du scheduler
+        ('emails' : heures d'envoi modifiées, 'auto_import' : fichier déposé,
+        'config:<cle>' : configuration modifiée)
+        """
+        if not self.redis_client:
+            logger.debug(f"Redis non disponible - évènement {event} ignoré")
+            return False
+        
+        try:
+            self.redis_client.publish('scheduler:reload', event)
+            logger.debug(f"Évènement envoyé: {event}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Erreur envoi évènement {event}: {e}")
+            return False
+    
     def start_listener(self, scheduler_service, app):
         """
-        Démarre un thread qui écoute les signaux Redis
+        Démarre un thread qui écoute les signaux Redis.
+        Une seule connexion pub/sub (worker redis-py) ; une coupure Redis est
+        journalisée et l'abonnement est rétabli à la reconnexion.
         
         Args:
             scheduler_service: Instance du scheduler service avec méthode reload_backup_schedule
@@ -90,55 +131,84 @@ class SchedulerReloadService:
         
         # Stocker l'app pour le contexte dans le thread
         self.app = app
+        self.scheduler_service = scheduler_service
         
         try:
-            self.pubsub = self.redis_client.pubsub()
-            self.pubsub.subscribe('scheduler:reload')
+            self.pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            self.pubsub.subscribe(**{'scheduler:reload': self._on_message})
             
-            def _listen():
-                logger.info("Listener scheduler reload démarré")
-                
-                for message in self.pubsub.listen():
-                    if message['type'] == 'message':
-                        data = message['data']
-                        logger.info(f"Signal reçu: {data}")
-                        
-                        # 🔥 IMPORTANT: Utiliser le contexte Flask dans le thread
-                        with self.app.app_context():
-                            try:
-                                if data.startswith('backup:'):
-                                    parts = data.split(':')
-                                    
-                                    if len(parts) == 2 and parts[1] == 'all':
-                                        # Recharger tous les backups
-                                        logger.info("Rechargement de TOUS les backup schedules")
-                                        scheduler_service.reload_all_backup_schedules()
-                                        
-                                    elif len(parts) == 3:
-                                        # Recharger un backup spécifique
-                                        backup_type = parts[1]
-                                        frequency = parts[2]
-                                        logger.info(f"Rechargement backup {backup_type} {frequency}")
-                                        scheduler_service.reload_backup_schedule(backup_type, frequency)
-                            
-                            except Exception as e:
-                                logger.error(f"Erreur traitement signal: {e}", exc_info=True)
-            
-            # Démarrer le thread d'écoute
-            self.listener_thread = threading.Thread(target=_listen, daemon=True)
-            self.listener_thread.start()
+            # get_message bloque jusqu'à LISTENER_POLL_TIMEOUT secondes : pas d'attente active
+            self.listener_thread = self.pubsub.run_in_thread(
+                sleep_time=LISTENER_POLL_TIMEOUT,
+                daemon=True,
+                exception_handler=self._on_listener_error
+            )
             
             logger.info("Thread listener scheduler reload démarré")
             
         except Exception as e:
             logger.error(f"Erreur démarrage listener: {e}")
     
+    def _on_message(self, message):
+        """Traite un signal reçu sur le canal scheduler:reload"""
+        data = message['data']
+        if not data.startswith('config:'):
+            logger.info(f"Signal reçu: {data}")
+        
+        scheduler_service = self.scheduler_service
+        
+        # 🔥 IMPORTANT: Utiliser le contexte Flask dans le thread
+        with self.app.app_context():
+            try:
+                if data.startswith('backup:'):
+                    parts = data.split(':')
+                    
+                    if len(parts) == 2 and parts[1] == 'all':
+                        # Recharger tous les backups
+                        logger.info("Rechargement de TOUS les backup schedules")
+                        scheduler_service.reload_all_backup_schedules()
+                        
+                    elif len(parts) == 3:
+                        # Recharger un backup spécifique
+                        backup_type = parts[1]
+                        frequency = parts[2]
+                        logger.info(f"Rechargement backup {backup_type} {frequency}")
+                        scheduler_service.reload_backup_schedule(backup_type, frequency)
+                
+                elif data == 'imap':
+                    logger.info("Rechargement de la tâche IMAP")
+                    scheduler_service.reload_imap_schedule()
+                
+                elif data == 'emails':
+                    scheduler_service.on_email_scheduled()
+                
+                elif data == 'auto_import':
+                    scheduler_service.on_file_dropped()
+                
+                elif data.startswith('config:'):
+                    scheduler_service.on_config_changed(data[len('config:'):])
+            
+            except Exception as e:
+                logger.error(f"Erreur traitement signal: {e}", exc_info=True)
+    
+    def _on_listener_error(self, error, pubsub, thread):
+        """Erreur de connexion du listener : on patiente, redis-py se réabonne seul"""
+        logger.warning(f"Listener scheduler reload: {error}")
+        time.sleep(LISTENER_RETRY_DELAY)
+    
     def stop_listener(self):
         """Arrête le listener proprement"""
+        if self.listener_thread:
+            try:
+                self.listener_thread.stop()
+                self.listener_thread = None
+            except Exception as e:
+                logger.error(f"Erreur arrêt listener: {e}")
+        
         if self.pubsub:
             try:
-                self.pubsub.unsubscribe('scheduler:reload')
                 self.pubsub.close()
+                self.pubsub = None
                 logger.info("Listener scheduler reload arrêté")
             except Exception as e:
                 logger.error(f"Erreur arrêt listener: {e}")
@@ -6,14 +6,36 @@ Support du rechargement dynamique via Redis pub/sub
 import os
 import fcntl
 import atexit
+import signal
+import threading
+import time
 import pytz
+from functools import lru_cache
 from datetime import datetime
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.combining import OrTrigger
+from apscheduler.jobstores.base import JobLookupError
 from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.executors.pool import ThreadPoolExecutor
 from flask import current_app
 
+from app import db
+from app.models.compliance import Recipient
+from app.services.config_service import get_config, get_configs, invalidate_config_cache
+from app.services.lock_service import acquire_lock, release_lock
+from app.services.email_service import check_scheduled_emails
+from app.services.external_import_service import (
+    check_altaview_auto_import,
+    fetch_imap_attachments,
+    fetch_altaview_api
+)
+from app.services.import_service import supprimer_doublons_altaview
+from app.services.compliance_service import archiver_conformite_quotidienne
+from app.services.cleanup_service import cleanup_service
+from app.services.backup_service import get_backup_service
+from app.services.scheduler_reload_service import get_reload_service
+
 # Timezone Europe/Paris
 PARIS_TZ = pytz.timezone('Europe/Paris')
 
@@ -22,65 +44,34 @@ scheduler = None
 scheduler_lock = None
 _flask_app = None  # Stocker l'app Flask pour les jobs
 
+# Retard toléré (s) avant qu'une exécution manquée soit abandonnée.
+# Les backups et l'archivage quotidien gardent une heure : mieux vaut
+# les rattraper après un redémarrage que d'attendre le jour suivant.
+MISFIRE_GRACE_TIME = 300
+DAILY_MISFIRE_GRACE_TIME = 3600
 
-# =============================================================================
-# FONCTIONS WRAPPER SÉRIALISABLES POUR APScheduler
-# Ces fonctions sont au niveau module pour permettre la sérialisation
-# =============================================================================
-
-def _scheduled_check_emails():
-    """Wrapper sérialisable pour check_scheduled_emails_job"""
-    if _flask_app:
-        with _flask_app.app_context():
-            check_scheduled_emails_job()
-
-def _scheduled_auto_import():
-    """Wrapper sérialisable pour check_auto_import_job"""
-    if _flask_app:
-        with _flask_app.app_context():
-            check_auto_import_job()
-
-def _scheduled_imap_fetch():
-    """Wrapper sérialisable pour fetch_imap_job"""
-    if _flask_app:
-        with _flask_app.app_context():
-            fetch_imap_job()
-
-def _scheduled_api_fetch():
-    """Wrapper sérialisable pour fetch_api_job"""
-    if _flask_app:
-        with _flask_app.app_context():
-            fetch_api_job()
+# Threads du pool d'exécution réservé aux backups
+BACKUP_EXECUTOR_WORKERS = 2
 
-def _scheduled_cleanup_duplicates():
-    """Wrapper sérialisable pour cleanup_duplicates_job"""
-    if _flask_app:
-        with _flask_app.app_context():
-            cleanup_duplicates_job()
+# Heures d'envoi des emails programmés actuellement planifiées ("HH:MM")
+_email_schedule_times = None
 
-def _scheduled_cleanup_files():
-    """Wrapper sérialisable pour cleanup_processed_files_job"""
-    if _flask_app:
-        with _flask_app.app_context():
-            cleanup_processed_files_job()
+# Statut du scheduler mis en cache quelques secondes (propre à chaque processus)
+SCHEDULER_STATUS_TTL = 2
+_scheduler_status_cache = {'value': None, 'expires': 0.0}
 
-def _scheduled_archive_daily():
-    """Wrapper sérialisable pour archive_daily_job"""
-    if _flask_app:
-        with _flask_app.app_context():
-            archive_daily_job()
 
-def _scheduled_backup_db(frequency, config):
-    """Wrapper sérialisable pour backup_db_job"""
-    if _flask_app:
-        with _flask_app.app_context():
-            backup_db_job(frequency, config)
+# =============================================================================
+# DISPATCHER SÉRIALISABLE POUR APScheduler
+# Les jobs référencent tous _run_job (fonction du module) et le nom de la tâche
+# est passé via args, ce qui garde les jobs sérialisables dans le jobstore
+# =============================================================================
 
-def _scheduled_backup_fs(frequency, config):
-    """Wrapper sérialisable pour backup_fs_job"""
+def _run_job(name, *args):
+    """Exécute la tâche `name` (voir _JOB_FUNCS) dans le contexte de l'application"""
     if _flask_app:
         with _flask_app.app_context():
-            backup_fs_job(frequency, config)
+            _JOB_FUNCS[name](*args)
 
 
 def init_scheduler(app):
@@ -95,25 +86,36 @@ def init_scheduler(app):
     lock_file_path = os.path.join(app.config.get('LOG_DIR', '/app/data/logs'), 'scheduler.lock')
     
     try:
-        scheduler_lock = open(lock_file_path, 'wb')
-        fcntl.flock(scheduler_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        # Ouvert sans troncature : le fichier contient le PID du détenteur du verrou
+        scheduler_lock = os.fdopen(os.open(lock_file_path, os.O_RDWR | os.O_CREAT, 0o644), 'r+b')
+        try:
+            fcntl.flock(scheduler_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            scheduler_lock.close()
+            scheduler_lock = None
+            raise
+        scheduler_lock.truncate(0)
+        scheduler_lock.write(str(os.getpid()).encode())
+        scheduler_lock.flush()
         
         with app.app_context():
-            from app.services.config_service import get_config
-            
             # Configuration jobstore persistant dans PostgreSQL
             jobstores = {
                 'default': SQLAlchemyJobStore(url=app.config['SQLALCHEMY_DATABASE_URI'])
             }
             
+            # Pool dédié aux backups : une sauvegarde longue ne doit pas
+            # monopoliser les threads des tâches courtes (emails, imports)
             executors = {
-                'default': ThreadPoolExecutor(20)
+                'default': ThreadPoolExecutor(20),
+                'backups': ThreadPoolExecutor(BACKUP_EXECUTOR_WORKERS)
             }
             
+            # coalesce : une seule exécution pour plusieurs déclenchements manqués
             job_defaults = {
-                'coalesce': False,
+                'coalesce': True,
                 'max_instances': 1,
-                'misfire_grace_time': 3600
+                'misfire_grace_time': MISFIRE_GRACE_TIME
             }
             
             scheduler = BackgroundScheduler(
@@ -123,19 +125,35 @@ def init_scheduler(app):
                 timezone=PARIS_TZ
             )
             
-            # Tâche: Vérification des emails programmés (chaque minute)
+            # Tâche: Emails programmés, déclenchée uniquement aux heures d'envoi
+            # des destinataires actifs (en pause s'il n'y en a aucun)
+            global _email_schedule_times
+            _email_schedule_times = get_email_schedule_times()
             scheduler.add_job(
-                func=_scheduled_check_emails,
-                trigger="interval",
-                seconds=60,
+                func=_run_job,
+                args=['check_scheduled_emails'],
+                trigger=build_email_trigger(_email_schedule_times),
                 id='check_scheduled_emails',
-                name='Vérification emails programmés',
+                name='Envoi emails programmés',
+                replace_existing=True,
+                **({} if _email_schedule_times else {'next_run_time': None})
+            )
+            
+            # Tâche: Resynchronisation des heures d'envoi (si un signal a été manqué)
+            scheduler.add_job(
+                func=_run_job,
+                args=['refresh_email_schedule'],
+                trigger="interval",
+                minutes=EMAIL_SCHEDULE_REFRESH_MINUTES,
+                id='refresh_email_schedule',
+                name='Resynchronisation heures emails',
                 replace_existing=True
             )
             
             # Tâche: Import automatique des fichiers (chaque minute)
             scheduler.add_job(
-                func=_scheduled_auto_import,
+                func=_run_job,
+                args=['auto_import'],
                 trigger="interval",
                 seconds=60,
                 id='auto_import_files',
@@ -143,13 +161,15 @@ def init_scheduler(app):
                 replace_existing=True
             )
             
-            # Tâche: Import IMAP (selon config)
+            # Tâche: Import IMAP (intervalle selon config)
+            imap_interval = get_imap_interval(get_config('email_import', {}))
             scheduler.add_job(
-                func=_scheduled_imap_fetch,
+                func=_run_job,
+                args=['imap_fetch'],
                 trigger="interval",
-                minutes=1,
+                minutes=imap_interval,
                 id='imap_check',
-                name='Vérification IMAP',
+                name=f'Vérification IMAP ({imap_interval} min)',
                 replace_existing=True
             )
             
@@ -162,7 +182,8 @@ def init_scheduler(app):
             if api_schedule_config.get('actif', True):
                 interval_minutes = int(api_schedule_config.get('interval_minutes', 60))
                 scheduler.add_job(
-                    func=_scheduled_api_fetch,
+                    func=_run_job,
+                    args=['api_fetch'],
                     trigger="interval",
                     minutes=interval_minutes,
                     id='api_import',
@@ -172,7 +193,8 @@ def init_scheduler(app):
             
             # Tâche: Nettoyage des doublons (toutes les heures)
             scheduler.add_job(
-                func=_scheduled_cleanup_duplicates,
+                func=_run_job,
+                args=['cleanup_duplicates'],
                 trigger="interval",
                 hours=1,
                 id='cleanup_duplicates',
@@ -182,7 +204,8 @@ def init_scheduler(app):
             
             # Tâche: Nettoyage fichiers processed/ > 48h (tous les jours à 3h)
             scheduler.add_job(
-                func=_scheduled_cleanup_files,
+                func=_run_job,
+                args=['cleanup_files'],
                 trigger=CronTrigger(hour=3, minute=0, timezone=PARIS_TZ),
                 id='cleanup_processed_files',
                 name='Nettoyage fichiers processed/ > 48h',
@@ -193,7 +216,8 @@ def init_scheduler(app):
             arch_config = get_config('archive_config', {'heure': 18, 'minute': 0, 'actif': True})
             if arch_config.get('actif', True):
                 scheduler.add_job(
-                    func=_scheduled_archive_daily,
+                    func=_run_job,
+                    args=['archive_daily'],
                     trigger=CronTrigger(
                         hour=int(arch_config.get('heure', 18)),
                         minute=int(arch_config.get('minute', 0)),
@@ -201,14 +225,16 @@ def init_scheduler(app):
                     ),
                     id='archive_daily',
                     name='Archivage quotidien',
+                    misfire_grace_time=DAILY_MISFIRE_GRACE_TIME,
                     replace_existing=True
                 )
             
-            # Charger et ajouter les tâches de backup configurées
-            load_backup_schedules(app)
-            
             scheduler.start()
             
+            # Synchroniser les tâches de backup persistées avec la configuration
+            # (nécessite le scheduler démarré pour lire le jobstore)
+            load_backup_schedules(app)
+            
             # Lister tous les jobs après démarrage
             all_jobs = scheduler.get_jobs()
             app.logger.info(f"📋 Scheduler démarré avec {len(all_jobs)} jobs persistants")
@@ -218,15 +244,14 @@ def init_scheduler(app):
             
             # Démarrer le listener Redis avec l'app pour le contexte
             try:
-                from app.services.scheduler_reload_service import get_reload_service
                 reload_service = get_reload_service()
                 reload_service.start_listener(SchedulerServiceWrapper(), app)
                 app.logger.info("Listener Redis pour rechargement scheduler démarré")
             except Exception as e:
                 app.logger.warning(f"Listener Redis non disponible: {e}")
             
-            # Arrêt propre
-            atexit.register(shutdown_scheduler)
+            # Arrêt propre sur SIGTERM/SIGINT (atexit seulement en dernier recours)
+            _install_shutdown_handlers()
             
             return True
             
@@ -245,11 +270,10 @@ class SchedulerServiceWrapper:
     
     def reload_backup_schedule(self, backup_type, frequency):
         """Recharge un schedule de backup spécifique"""
-        from app.services.config_service import get_config
-        from flask import current_app
         
         try:
             config_key = f'backup_schedule_{backup_type}_{frequency}'
+            invalidate_config_cache(config_key)
             config = get_config(config_key, {})
             
             if config:
@@ -261,50 +285,104 @@ class SchedulerServiceWrapper:
         except Exception as e:
             current_app.logger.error(f"Erreur reload backup schedule: {e}", exc_info=True)
     
+    def on_email_scheduled(self):
+        """Un destinataire a été ajouté/modifié : recalcule les heures d'envoi"""
+        reschedule_emails()
+    
+    def on_config_changed(self, cle):
+        """Une configuration a été modifiée dans un autre processus"""
+        invalidate_config_cache(cle)
+    
+    def on_file_dropped(self):
+        """Un fichier a été déposé dans le dossier d'import : import immédiat"""
+        trigger_auto_import()
+    
+    def reload_imap_schedule(self):
+        """Recharge l'intervalle de la tâche IMAP depuis la configuration"""
+        
+        try:
+            invalidate_config_cache('email_import')
+            interval = get_imap_interval(get_config('email_import', {}))
+            if reschedule_imap(interval):
+                current_app.logger.info(f"✅ Tâche IMAP rechargée: {interval} min")
+        except Exception as e:
+            current_app.logger.error(f"Erreur reload IMAP: {e}", exc_info=True)
+    
     def reload_all_backup_schedules(self):
         """Recharge TOUS les schedules de backup"""
-        from app.services.config_service import get_config
-        from flask import current_app
-        
-        frequencies = ['daily', 'weekly', 'monthly']
-        backup_types = ['db', 'fs']
+        config_keys = _backup_config_keys()
+        for config_key in config_keys.values():
+            invalidate_config_cache(config_key)
+        configs = get_configs(config_keys.values(), {})
         
         reloaded = 0
-        for backup_type in backup_types:
-            for frequency in frequencies:
-                try:
-                    config_key = f'backup_schedule_{backup_type}_{frequency}'
-                    config = get_config(config_key, {})
+        for (backup_type, frequency), config_key in config_keys.items():
+            try:
+                config = configs[config_key]
+                
+                if config and not _backup_job_up_to_date(backup_type, frequency, config):
+                    reschedule_backup(backup_type, frequency, config)
+                    reloaded += 1
                     
-                    if config:
-                        reschedule_backup(backup_type, frequency, config)
-                        reloaded += 1
-                        
-                except Exception as e:
-                    current_app.logger.error(f"Erreur reload {backup_type}/{frequency}: {e}")
+            except Exception as e:
+                current_app.logger.error(f"Erreur reload {backup_type}/{frequency}: {e}")
         
         current_app.logger.info(f"✅ {reloaded} backup schedules rechargés")
 
 
+def _backup_config_keys():
+    """Clés de configuration des backups : {(type, fréquence): clé}"""
+    return {
+        (backup_type, frequency): f'backup_schedule_{backup_type}_{frequency}'
+        for backup_type in ('db', 'fs')
+        for frequency in ('daily', 'weekly', 'monthly')
+    }
+
+
 def load_backup_schedules(app):
     """
-    Charge et ajoute les tâches de backup depuis la configuration.
+    Synchronise les tâches de backup du jobstore persistant avec la configuration.
+    Une tâche déjà persistée avec la même configuration est conservée telle quelle
+    (son prochain déclenchement survit au redémarrage) ; seules les tâches
+    manquantes, modifiées ou désactivées sont reprogrammées.
     """
-    from app.services.config_service import get_config
+    config_keys = _backup_config_keys()
+    configs = get_configs(config_keys.values(), {})
     
-    frequencies = ['daily', 'weekly', 'monthly']
-    backup_types = ['db', 'fs']
+    for (backup_type, frequency), config_key in config_keys.items():
+        config = configs[config_key]
+        if _backup_job_up_to_date(backup_type, frequency, config):
+            continue
+        
+        try:
+            reschedule_backup(backup_type, frequency, config)
+        except Exception as e:
+            app.logger.error(f"Erreur chargement backup {backup_type}/{frequency}: {e}")
+
+
+def _install_shutdown_handlers():
+    """
+    Arrête le scheduler à la réception de SIGTERM/SIGINT, puis appelle le
+    handler précédent (celui du worker gunicorn notamment).
+    Les signaux ne peuvent être installés que depuis le thread principal :
+    sinon on se rabat sur atexit.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        atexit.register(shutdown_scheduler)
+        return
     
-    for backup_type in backup_types:
-        for frequency in frequencies:
-            config_key = f'backup_schedule_{backup_type}_{frequency}'
-            config = get_config(config_key, {})
-            
-            if config.get('enabled', False):
-                try:
-                    reschedule_backup(backup_type, frequency, config)
-                except Exception as e:
-                    app.logger.error(f"Erreur chargement backup {backup_type}/{frequency}: {e}")
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        previous = signal.getsignal(signum)
+        
+        def _handler(received, frame, previous=previous):
+            shutdown_scheduler()
+            if callable(previous):
+                previous(received, frame)
+            elif previous == signal.SIG_DFL:
+                signal.signal(received, signal.SIG_DFL)
+                os.kill(os.getpid(), received)
+        
+        signal.signal(signum, _handler)
 
 
 def shutdown_scheduler():
@@ -318,7 +396,6 @@ def shutdown_scheduler():
     
     # Arrêter le listener Redis
     try:
-        from app.services.scheduler_reload_service import get_reload_service
         reload_service = get_reload_service()
         reload_service.stop_listener()
     except:
@@ -326,10 +403,12 @@ def shutdown_scheduler():
     
     if scheduler_lock:
         try:
+            scheduler_lock.truncate(0)
             fcntl.flock(scheduler_lock, fcntl.LOCK_UN)
             scheduler_lock.close()
         except:
             pass
+        scheduler_lock = None
 
 
 def run_in_context(app, func):
@@ -345,9 +424,6 @@ def run_in_context(app, func):
 
 def check_scheduled_emails_job():
     """Tâche: Vérifier et envoyer les emails programmés."""
-    from app.services.email_service import check_scheduled_emails
-    from app.services.lock_service import acquire_lock, release_lock
-    from flask import current_app
     
     lock_key = 'scheduled_emails_lock'
     if not acquire_lock(lock_key, timeout=120):
@@ -362,9 +438,6 @@ def check_scheduled_emails_job():
 
 def check_auto_import_job():
     """Tâche: Vérifier et importer les fichiers CSV."""
-    from app.services.external_import_service import check_altaview_auto_import
-    from app.services.lock_service import acquire_lock, release_lock
-    from flask import current_app
     
     lock_key = 'auto_import_lock'
     if not acquire_lock(lock_key, timeout=300):  # 5 min max
@@ -379,9 +452,6 @@ def check_auto_import_job():
 
 def fetch_imap_job():
     """Tâche: Récupérer les pièces jointes IMAP."""
-    from app.services.external_import_service import fetch_imap_attachments
-    from app.services.lock_service import acquire_lock, release_lock
-    from flask import current_app
     
     lock_key = 'imap_fetch_lock'
     if not acquire_lock(lock_key, timeout=300):  # 5 min max
@@ -396,9 +466,6 @@ def fetch_imap_job():
 
 def fetch_api_job():
     """Tâche: Importer depuis l'API Altaview."""
-    from app.services.external_import_service import fetch_altaview_api
-    from app.services.lock_service import acquire_lock, release_lock
-    from flask import current_app
     
     lock_key = 'api_fetch_lock'
     if not acquire_lock(lock_key, timeout=600):  # 10 min max
@@ -413,9 +480,6 @@ def fetch_api_job():
 
 def cleanup_duplicates_job():
     """Tâche: Nettoyer les doublons."""
-    from app.services.import_service import supprimer_doublons_altaview
-    from app.services.lock_service import acquire_lock, release_lock
-    from flask import current_app
     
     lock_key = 'cleanup_duplicates_lock'
     if not acquire_lock(lock_key, timeout=600):  # 10 min max
@@ -430,15 +494,11 @@ def cleanup_duplicates_job():
 
 def archive_daily_job():
     """Tâche: Archivage quotidien."""
-    from app.services.compliance_service import archiver_conformite_quotidienne
     archiver_conformite_quotidienne()
 
 
 def cleanup_processed_files_job():
     """Tâche: Nettoyer les fichiers processed/ plus anciens que 48h."""
-    from app.services.cleanup_service import cleanup_service
-    from app.services.lock_service import acquire_lock, release_lock
-    from flask import current_app
     
     lock_key = 'cleanup_files_lock'
     if not acquire_lock(lock_key, timeout=300):  # 5 min max
@@ -453,9 +513,6 @@ def cleanup_processed_files_job():
 
 def backup_db_job(frequency, config):
     """Tâche: Sauvegarde DB automatique"""
-    from app.services.backup_service import BackupService
-    from app.services.lock_service import acquire_lock, release_lock
-    from flask import current_app
     
     # 🔒 Lock pour éviter doublons
     lock_key = f'backup_db_{frequency}_lock'
@@ -464,7 +521,7 @@ def backup_db_job(frequency, config):
         return
     
     try:
-        backup_service = BackupService()
+        backup_service = get_backup_service()
         description = f'Sauvegarde automatique {frequency}'
         
         result = backup_service.create_backup(description)
@@ -487,9 +544,6 @@ def backup_db_job(frequency, config):
 
 def backup_fs_job(frequency, config):
     """Tâche: Sauvegarde FS automatique"""
-    from app.services.backup_service import BackupService
-    from app.services.lock_service import acquire_lock, release_lock
-    from flask import current_app
     
     # 🔒 Lock pour éviter doublons
     lock_key = f'backup_fs_{frequency}_lock'
@@ -498,7 +552,7 @@ def backup_fs_job(frequency, config):
         return
     
     try:
-        backup_service = BackupService()
+        backup_service = get_backup_service()
         description = f'Sauvegarde FS automatique {frequency}'
         
         result = backup_service.create_fs_backup(description, config)
@@ -519,8 +573,25 @@ def backup_fs_job(frequency, config):
         release_lock(lock_key)
 
 
+def invalidate_scheduler_status():
+    """Invalide le statut en cache (après une reprogrammation)"""
+    _scheduler_status_cache['value'] = None
+
+
 def get_scheduler_status():
-    """Retourne le statut du scheduler."""
+    """Retourne le statut du scheduler (mis en cache SCHEDULER_STATUS_TTL secondes)."""
+    now = time.monotonic()
+    if _scheduler_status_cache['value'] is not None and now < _scheduler_status_cache['expires']:
+        return _scheduler_status_cache['value']
+    
+    status = _read_scheduler_status()
+    _scheduler_status_cache['value'] = status
+    _scheduler_status_cache['expires'] = now + SCHEDULER_STATUS_TTL
+    return status
+
+
+def _read_scheduler_status():
+    """Lit le statut réel : jobs du scheduler local ou verrou d'un autre processus."""
     global scheduler
     
     if scheduler and scheduler.running:
@@ -544,19 +615,13 @@ def get_scheduler_status():
             'jobs': jobs
         }
     
-    # Vérifier si un autre processus a le lock
+    # Vérifier si un autre processus détient le lock (PID écrit dans le fichier)
     lock_file_path = os.path.join(
         current_app.config.get('LOG_DIR', '/app/data/logs'),
         'scheduler.lock'
     )
     
-    try:
-        if os.path.exists(lock_file_path):
-            with open(lock_file_path, 'wb') as f:
-                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
-                fcntl.flock(f, fcntl.LOCK_UN)
-            return {'running': False, 'jobs': []}
-    except BlockingIOError:
+    if _lock_holder_alive(lock_file_path):
         return {
             'running': True,
             'managed_by': 'main_process',
@@ -566,9 +631,37 @@ def get_scheduler_status():
     return {'running': False, 'jobs': []}
 
 
+def _lock_holder_alive(lock_file_path):
+    """Le processus dont le PID figure dans le fichier de verrou est-il vivant ?"""
+    try:
+        with open(lock_file_path, 'rb') as f:
+            pid = int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return False
+    
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _remove_job(job_id):
+    """Supprime un job s'il existe (une seule opération sur le jobstore)"""
+    try:
+        scheduler.remove_job(job_id)
+    except JobLookupError:
+        pass
+
+
 def reschedule_archive(heure, minute, actif):
     """Reprogramme la tâche d'archivage."""
     global scheduler, _flask_app
+    invalidate_scheduler_status()
     
     if not scheduler or not scheduler.running:
         return False
@@ -579,15 +672,16 @@ def reschedule_archive(heure, minute, actif):
         if actif:
             trigger = CronTrigger(hour=heure, minute=minute, timezone=PARIS_TZ)
             scheduler.add_job(
-                func=_scheduled_archive_daily,
+                func=_run_job,
+                args=['archive_daily'],
                 trigger=trigger,
                 id=job_id,
                 name='Archivage quotidien',
+                misfire_grace_time=DAILY_MISFIRE_GRACE_TIME,
                 replace_existing=True
             )
         else:
-            if scheduler.get_job(job_id):
-                scheduler.remove_job(job_id)
+            _remove_job(job_id)
         
         return True
         
@@ -596,6 +690,34 @@ def reschedule_archive(heure, minute, actif):
         return False
 
 
+@lru_cache(maxsize=64)
+def _build_backup_trigger(frequency, heure, day_of_week, day_of_month):
+    """
+    Trigger d'une tâche de backup (timezone Paris), mémorisé par paramètres.
+    Retourne None pour une fréquence inconnue.
+    """
+    time_parts = heure.split(':')
+    hour = int(time_parts[0])
+    minute = int(time_parts[1]) if len(time_parts) > 1 else 0
+    
+    if frequency == 'daily':
+        return CronTrigger(hour=hour, minute=minute, timezone=PARIS_TZ)
+    if frequency == 'weekly':
+        return CronTrigger(day_of_week=int(day_of_week), hour=hour, minute=minute, timezone=PARIS_TZ)
+    if frequency == 'monthly':
+        return CronTrigger(day=int(day_of_month), hour=hour, minute=minute, timezone=PARIS_TZ)
+    return None
+
+
+def _backup_job_up_to_date(backup_type, frequency, config):
+    """La tâche persistée correspond-elle déjà à cette configuration ?"""
+    job = scheduler.get_job(f'backup_{backup_type}_{frequency}')
+    return (
+        job is not None and config.get('enabled', False) and job.executor == 'backups'
+        and tuple(job.args) == (f'backup_{backup_type}', frequency, config)
+    )
+
+
 def reschedule_backup(backup_type, frequency, config):
     """
     Reprogramme une tâche de backup (DB ou FS).
@@ -606,6 +728,7 @@ def reschedule_backup(backup_type, frequency, config):
         config: dict avec 'time', 'enabled', 'retention', etc.
     """
     global scheduler, _flask_app
+    invalidate_scheduler_status()
     
     if not scheduler or not scheduler.running:
         return False
@@ -614,48 +737,35 @@ def reschedule_backup(backup_type, frequency, config):
     
     try:
         if config.get('enabled', False):
-            # Parser l'heure
-            time_parts = config.get('time', '03:00').split(':')
-            hour = int(time_parts[0])
-            minute = int(time_parts[1]) if len(time_parts) > 1 else 0
-            
-            # Créer le trigger selon la fréquence avec timezone Paris
-            if frequency == 'daily':
-                trigger = CronTrigger(hour=hour, minute=minute, timezone=PARIS_TZ)
-            elif frequency == 'weekly':
-                day_of_week = int(config.get('day_of_week', 6))
-                trigger = CronTrigger(day_of_week=day_of_week, hour=hour, minute=minute, timezone=PARIS_TZ)
-            elif frequency == 'monthly':
-                day_of_month = int(config.get('day_of_month', 1))
-                trigger = CronTrigger(day=day_of_month, hour=hour, minute=minute, timezone=PARIS_TZ)
-            else:
+            trigger = _build_backup_trigger(
+                frequency,
+                config.get('time', '03:00'),
+                config.get('day_of_week', 6),
+                config.get('day_of_month', 1)
+            )
+            if trigger is None:
                 return False
             
-            # Sélectionner la fonction wrapper appropriée
-            if backup_type == 'db':
-                job_func = _scheduled_backup_db
-            else:  # fs
-                job_func = _scheduled_backup_fs
-            
             # Ajouter ou remplacer le job (jobstore persistant)
             # Les arguments sont passés via args pour permettre la sérialisation
             scheduler.add_job(
-                func=job_func,
-                args=[frequency, config],
+                func=_run_job,
+                args=[f'backup_{backup_type}', frequency, config],
                 trigger=trigger,
                 id=job_id,
                 name=f'Backup {backup_type.upper()} {frequency}',
+                executor='backups',
+                max_instances=1,
+                misfire_grace_time=DAILY_MISFIRE_GRACE_TIME,
                 replace_existing=True
             )
             
             if _flask_app:
                 with _flask_app.app_context():
-                    from flask import current_app
                     current_app.logger.info(f"✅ Job backup ajouté/mis à jour: {job_id}")
         else:
             # Désactiver le job
-            if scheduler.get_job(job_id):
-                scheduler.remove_job(job_id)
+            _remove_job(job_id)
         
         return True
         
@@ -663,7 +773,6 @@ def reschedule_backup(backup_type, frequency, config):
         # Utiliser _flask_app pour logger si current_app pas disponible
         if _flask_app:
             with _flask_app.app_context():
-                from flask import current_app
                 current_app.logger.error(f"Erreur reprogrammation backup {backup_type}/{frequency}: {e}")
         return False
 
@@ -677,6 +786,7 @@ def reschedule_api_import(interval_minutes, actif):
         actif: bool - activer ou désactiver
     """
     global scheduler, _flask_app
+    invalidate_scheduler_status()
     
     if not scheduler or not scheduler.running:
         return False
@@ -690,7 +800,8 @@ def reschedule_api_import(interval_minutes, actif):
             
             # Ajouter ou remplacer le job
             scheduler.add_job(
-                func=_scheduled_api_fetch,
+                func=_run_job,
+                args=['api_fetch'],
                 trigger='interval',
                 minutes=interval_minutes,
                 id=job_id,
@@ -699,14 +810,173 @@ def reschedule_api_import(interval_minutes, actif):
             )
         else:
             # Désactiver le job
-            if scheduler.get_job(job_id):
-                scheduler.remove_job(job_id)
+            _remove_job(job_id)
         
         return True
         
     except Exception as e:
         if _flask_app:
             with _flask_app.app_context():
-                from flask import current_app
                 current_app.logger.error(f"Erreur reprogrammation API import: {e}")
         return False
+
+
+def get_imap_interval(config):
+    """Intervalle (minutes) de la tâche IMAP depuis la config email_import"""
+    try:
+        return max(1, int(config.get('check_interval', 15)))
+    except (TypeError, ValueError):
+        return 15
+
+
+def reschedule_imap(interval_minutes):
+    """
+    Reprogramme la tâche IMAP à l'intervalle configuré.
+    
+    Args:
+        interval_minutes: Intervalle en minutes
+    """
+    global scheduler, _flask_app
+    invalidate_scheduler_status()
+    
+    if not scheduler or not scheduler.running:
+        return False
+    
+    try:
+        scheduler.add_job(
+            func=_run_job,
+            args=['imap_fetch'],
+            trigger='interval',
+            minutes=interval_minutes,
+            id='imap_check',
+            name=f'Vérification IMAP ({interval_minutes} min)',
+            replace_existing=True
+        )
+        return True
+        
+    except Exception as e:
+        if _flask_app:
+            with _flask_app.app_context():
+                current_app.logger.error(f"Erreur reprogrammation IMAP: {e}")
+        return False
+
+
+# Intervalle du filet de sécurité qui resynchronise les heures d'envoi
+EMAIL_SCHEDULE_REFRESH_MINUTES = 10
+
+
+def get_email_schedule_times():
+    """Heures d'envoi distinctes ("HH:MM") des destinataires actifs"""
+    rows = db.session.query(Recipient.schedule_time).filter(
+        Recipient.active.is_(True)
+    ).distinct().all()
+    
+    times = set()
+    for (schedule_time,) in rows:
+        try:
+            heure, minute = schedule_time.split(':')
+            times.add(f'{int(heure):02d}:{int(minute):02d}')
+        except (AttributeError, ValueError):
+            continue
+    return tuple(sorted(times))
+
+
+def build_email_trigger(times):
+    """
+    Trigger déclenché à chacune des heures d'envoi.
+    Sans destinataire, un trigger quotidien par défaut est utilisé (tâche en pause).
+    """
+    if not times:
+        return CronTrigger(hour=8, minute=0, timezone=PARIS_TZ)
+    triggers = []
+    for t in times:
+        heure, minute = t.split(':')
+        triggers.append(CronTrigger(hour=int(heure), minute=int(minute), timezone=PARIS_TZ))
+    return triggers[0] if len(triggers) == 1 else OrTrigger(triggers)
+
+
+def reschedule_emails():
+    """
+    Reprogramme la tâche des emails programmés sur les heures d'envoi actuelles.
+    Sans effet si elles n'ont pas changé.
+    """
+    global scheduler, _email_schedule_times
+    
+    if not scheduler or not scheduler.running:
+        return False
+    
+    times = get_email_schedule_times()
+    if times == _email_schedule_times:
+        return True
+    
+    invalidate_scheduler_status()
+    job_id = 'check_scheduled_emails'
+    try:
+        if times:
+            scheduler.reschedule_job(job_id, trigger=build_email_trigger(times))
+        else:
+            scheduler.pause_job(job_id)
+    except JobLookupError:
+        scheduler.add_job(
+            func=_run_job,
+            args=['check_scheduled_emails'],
+            trigger=build_email_trigger(times),
+            id=job_id,
+            name='Envoi emails programmés',
+            replace_existing=True,
+            **({} if times else {'next_run_time': None})
+        )
+    
+    _email_schedule_times = times
+    current_app.logger.info(f"📧 Heures d'envoi programmées: {', '.join(times) or 'aucune'}")
+    return True
+
+
+def notify_email_schedule_changed():
+    """
+    À appeler après modification d'un destinataire : reprogramme directement si
+    le scheduler tourne dans ce processus, sinon via le signal Redis.
+    """
+    if reschedule_emails():
+        return True
+    try:
+        return get_reload_service().signal_event('emails')
+    except Exception as e:
+        current_app.logger.warning(f"Signal emails programmés impossible: {e}")
+        return False
+
+
+def trigger_auto_import():
+    """
+    Lance immédiatement l'import automatique (fichier déposé par l'application)
+    au lieu d'attendre le prochain passage de la tâche.
+    """
+    global scheduler
+    
+    if scheduler and scheduler.running:
+        try:
+            scheduler.modify_job('auto_import_files', next_run_time=datetime.now(PARIS_TZ))
+            return True
+        except JobLookupError:
+            return False
+    
+    try:
+        return get_reload_service().signal_event('auto_import')
+    except Exception as e:
+        current_app.logger.warning(f"Signal import automatique impossible: {e}")
+        return False
+
+
+# Tâches exécutables par _run_job
+_JOB_FUNCS = {
+    'check_scheduled_emails': check_scheduled_emails_job,
+    'refresh_email_schedule': reschedule_emails,
+    'auto_import': check_auto_import_job,
+    'imap_fetch': fetch_imap_job,
+    'api_fetch': fetch_api_job,
+    'cleanup_duplicates': cleanup_duplicates_job,
+    'cleanup_files': cleanup_processed_files_job,
+    'archive_daily': archive_daily_job,
+    'backup_db': backup_db_job,
+    'backup_fs': backup_fs_job,
+}
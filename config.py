@@ -26,6 +26,7 @@ class Config:
     ALTAVIEW_AUTO_IMPORT_DIR = os.getenv('ALTAVIEW_AUTO_IMPORT_DIR', '/app/data/altaview_auto_import')
     LOG_DIR = os.getenv('LOG_DIR', '/app/data/logs')
     BACKUP_DIR = os.getenv('BACKUP_DIR', 'backups')  # NOUVEAU : Dossier backups
+    ARCHIVE_EXPORT_DIR = os.getenv('ARCHIVE_EXPORT_DIR', '/app/data/archive_exports')  # PDF/Excel des archives
     
     # Redis Cache (optionnel)
     REDIS_URL = os.getenv('REDIS_URL')  # NOUVEAU : Redis URL
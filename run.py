@@ -4,6 +4,8 @@ NBCM V2.5 - Point d'entrée
 NetBackup Compliance Manager
 """
 import os
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.schema import CreateIndex
 from app import create_app, db
 from app.models.user import create_default_admin
 from app.services.config_service import init_default_configs
@@ -26,6 +28,17 @@ def init_app():
         # Créer les tables
         db.create_all()
         
+        # Créer les index ajoutés depuis (create_all ne modifie pas les tables existantes).
+        # Tous les workers gunicorn passent ici en même temps : IF NOT EXISTS, et un
+        # échec (course entre workers) ne doit pas empêcher le démarrage.
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                try:
+                    with db.engine.begin() as conn:
+                        conn.execute(CreateIndex(index, if_not_exists=True))
+                except SQLAlchemyError as e:
+                    print(f"[INIT] Index {index.name} non créé: {e.__class__.__name__}")
+        
         # Créer l'admin par défaut
         create_default_admin()
         